@@ -0,0 +1,480 @@
+"""JSON over HTTP for the task engine, so other programs can use the scheduler.
+
+    python api.py                           # http://127.0.0.1:8080
+    python api.py --port 9000 --user alice
+
+Endpoints, with tasks as JSON objects of engine.TaskRecord's fields:
+
+    GET    /tasks?sort=deadline&descending=0&pending=0&limit=200&after=CURSOR
+    POST   /tasks        {"title", "description", "priority", "deadline", "duration"}
+    GET    /tasks/ID
+    PUT    /tasks/ID     same body as POST; a missing duration keeps the current one
+    PATCH  /tasks/ID     {"completed": true} and/or {"priority": "High"}
+    DELETE /tasks/ID
+    GET    /search?q=KEYWORD&limit=50
+    GET    /statistics
+
+Task lists are paged with keyset cursors: a page carries "next" and
+"previous" cursors to pass back as after= or before=.  GET responses
+carry an ETag, and a GET whose If-None-Match matches it is answered 304
+Not Modified without a body.  Requests arrive on asyncio streams and
+their engine calls run on a thread pool no larger than the connection
+pool.  Every request acts as one user: --user, or TASK_SCHEDULER_USER.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import dataclasses
+import hashlib
+import json
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import engine
+from db.storage import DB_ERRORS
+
+# Address served by default
+API_HOST = "127.0.0.1"
+API_PORT = 8080
+
+# Threads running engine calls; keep this at most the PostgreSQL pool's
+# POOL_MAX_SIZE (db/connection.py) so requests never queue for a connection
+API_THREADS = 8
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1024 * 1024
+
+# Seconds an idle keep-alive connection stays open
+KEEPALIVE_TIMEOUT = 15
+
+# Largest page of tasks a client may ask for
+MAX_PAGE_SIZE = 1000
+
+# Deadline format in task JSON; engine.parse_deadline reads it back
+DEADLINE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# JSON fields of list rows and of full task records
+ROW_FIELDS = tuple(field.name for field in dataclasses.fields(engine.TaskRow))
+RECORD_FIELDS = tuple(field.name for field in dataclasses.fields(engine.TaskRecord))
+
+# For each engine.TASK_SORTS field, the list row attribute it reads and
+# the JSON types a cursor may hold for it
+CURSOR_FIELDS = {
+    "id": ("id", int),
+    "title": ("title", str),
+    "priority": ("priority", str),
+    "deadline": ("deadline", (str, type(None))),
+    "completed": ("completed", bool),
+    "level": ("dependency_level", int),
+}
+
+
+class ApiError(Exception):
+    """A request error, answered with status and {"error": message}"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, path, query, headers, body=b""):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def param(self, name, default=None):
+        values = self.query.get(name)
+        return values[-1] if values else default
+
+    def int_param(self, name, default, low, high):
+        value = self.param(name)
+        if value is None:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be a whole number.") from None
+        if not low <= number <= high:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be from {low} to {high}.")
+        return number
+
+    def bool_param(self, name):
+        return self.param(name, "0").lower() in ("1", "true", "yes")
+
+    def json(self):
+        """The body as a JSON object"""
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object.")
+        return data
+
+
+def task_json(task, fields=ROW_FIELDS):
+    data = {name: getattr(task, name) for name in fields}
+    if task.deadline is not None:
+        data["deadline"] = task.deadline.strftime(DEADLINE_FORMAT)
+    return data
+
+
+def encode_cursor(task):
+    """Opaque page cursor holding a list row's sort values"""
+    values = json.dumps(task_json(task), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(values).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    """The list row an encode_cursor cursor was made from.
+
+    The values the sort order compares must have their column's type, so
+    a crafted cursor is rejected here rather than failing in the query.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        for field in engine.TASK_SORTS[sort]:
+            name, kind = CURSOR_FIELDS[field]
+            value = values[name]
+            if (isinstance(value, bool) and kind is int) or not isinstance(value, kind):
+                raise TypeError(f"{name} has the wrong type")
+        task = engine.TaskRow(**values)
+        if task.deadline is not None:
+            task.deadline = engine.parse_deadline(task.deadline)
+    except (binascii.Error, KeyError, TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid cursor.") from None
+    return task
+
+
+def task_arguments(data):
+    """(title, description, priority, deadline, duration) from a task object.
+
+    Only duration may be null (no estimate); the other fields are strings.
+    """
+    values = []
+    for name, default in (("title", ""), ("description", ""), ("priority", "Medium"),
+                          ("deadline", ""), ("duration", None)):
+        value = data.get(name, default)
+        if name == "duration":
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "duration must be a whole number.")
+        elif not isinstance(value, str):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be a string.")
+        values.append(value)
+    return tuple(values)
+
+
+def _found(task, task_id):
+    if task is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Task {task_id} not found.")
+    return task
+
+
+# ---------- HANDLERS ----------
+# Each runs on the thread pool and returns (status, JSON payload, headers)
+
+def list_tasks(request):
+    sort = request.param("sort", "deadline")
+    if sort not in engine.TASK_SORTS:
+        raise ApiError(HTTPStatus.BAD_REQUEST,
+                       f"sort must be one of {', '.join(engine.TASK_SORTS)}.")
+    limit = request.int_param("limit", engine.PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    after, before = request.param("after"), request.param("before")
+    if after and before:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Give after or before, not both.")
+    rows = engine.get_task_page(after=decode_cursor(after, sort) if after else None,
+                                before=decode_cursor(before, sort) if before else None,
+                                limit=limit, sort=sort,
+                                descending=request.bool_param("descending"),
+                                pending=request.bool_param("pending"))
+    full = len(rows) == limit
+    return HTTPStatus.OK, {
+        "tasks": [task_json(row) for row in rows],
+        "next": encode_cursor(rows[-1]) if rows and (full or before) else None,
+        "previous": encode_cursor(rows[0]) if rows and (after or (before and full)) else None,
+    }, {}
+
+
+def create_task(request):
+    title, description, priority, deadline, duration = task_arguments(request.json())
+    row = engine.insert_task_row(title, description, priority, deadline, duration)
+    record = engine.TaskRecord.from_row(row, description)
+    return (HTTPStatus.CREATED, task_json(record, RECORD_FIELDS),
+            {"Location": f"/tasks/{row.id}"})
+
+
+def get_task(request, task_id):
+    task_id = int(task_id)
+    record = _found(engine.get_task_details(task_id), task_id)
+    return HTTPStatus.OK, task_json(record, RECORD_FIELDS), {}
+
+
+def update_task(request, task_id):
+    task_id = int(task_id)
+    title, description, priority, deadline, duration = task_arguments(request.json())
+    row = _found(engine.update_task_row(task_id, title, description, priority,
+                                        deadline, duration), task_id)
+    record = engine.TaskRecord.from_row(row, description)
+    return HTTPStatus.OK, task_json(record, RECORD_FIELDS), {}
+
+
+def patch_task(request, task_id):
+    task_id = int(task_id)
+    data = request.json()
+    completed, priority = data.get("completed"), data.get("priority")
+    if completed is None and priority is None:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Give completed and/or priority.")
+    if completed is not None and not isinstance(completed, bool):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "completed must be true or false.")
+    if priority is not None and not isinstance(priority, str):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "priority must be a string.")
+    record = _found(engine.patch_task_record(task_id, completed, priority), task_id)
+    return HTTPStatus.OK, task_json(record, RECORD_FIELDS), {}
+
+
+def delete_task(request, task_id):
+    task_id = int(task_id)
+    _found(engine.delete_tasks([task_id]) or None, task_id)
+    return HTTPStatus.NO_CONTENT, None, {}
+
+
+def search_tasks(request):
+    keyword = request.param("q", "").strip()
+    if not keyword:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "q is required.")
+    limit = request.int_param("limit", engine.SEARCH_LIMIT, 1, engine.SEARCH_LIMIT)
+    rows = engine.search_task_rows(keyword, limit)
+    return HTTPStatus.OK, {"tasks": [task_json(row) for row in rows]}, {}
+
+
+def task_statistics(request):
+    stats = engine.get_task_statistics()
+    if stats is None:
+        raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "Statistics unavailable.")
+    return HTTPStatus.OK, stats, {}
+
+
+# (method, path pattern, handler); pattern groups are passed to the handler
+ROUTES = (
+    ("GET", re.compile(r"/tasks"), list_tasks),
+    ("POST", re.compile(r"/tasks"), create_task),
+    ("GET", re.compile(r"/tasks/(\d+)"), get_task),
+    ("PUT", re.compile(r"/tasks/(\d+)"), update_task),
+    ("PATCH", re.compile(r"/tasks/(\d+)"), patch_task),
+    ("DELETE", re.compile(r"/tasks/(\d+)"), delete_task),
+    ("GET", re.compile(r"/search"), search_tasks),
+    ("GET", re.compile(r"/statistics"), task_statistics),
+)
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header matches etag (weak comparison)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def respond(request):
+    """Run the request's handler; returns (status, headers, body bytes).
+
+    A GET answer's ETag is a hash of its body, so it changes exactly when
+    the representation does.
+    """
+    method = "GET" if request.method == "HEAD" else request.method
+    allowed = []
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(request.path)
+        if match is None:
+            continue
+        if route_method != method:
+            allowed.append(route_method)
+            continue
+        try:
+            status, payload, headers = handler(request, *match.groups())
+        except ApiError as e:
+            status, payload, headers = e.status, {"error": str(e)}, {}
+        except ValueError as e:
+            status, payload, headers = HTTPStatus.BAD_REQUEST, {"error": str(e)}, {}
+        except DB_ERRORS as e:
+            status, payload, headers = (HTTPStatus.SERVICE_UNAVAILABLE,
+                                        {"error": f"Database error: {e}"}, {})
+        except Exception:
+            # A bug, not a bad request: log it and still answer the client
+            traceback.print_exc()
+            status, payload, headers = (HTTPStatus.INTERNAL_SERVER_ERROR,
+                                        {"error": "Internal server error."}, {})
+        break
+    else:
+        if allowed:
+            status, payload = HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Method not allowed."}
+            if "GET" in allowed:
+                allowed.append("HEAD")
+            headers = {"Allow": ", ".join(allowed)}
+        else:
+            status, payload, headers = HTTPStatus.NOT_FOUND, {"error": "Not found."}, {}
+
+    body = b"" if payload is None else json.dumps(payload, separators=(",", ":")).encode()
+    if method == "GET" and status == HTTPStatus.OK:
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return HTTPStatus.NOT_MODIFIED, headers, b""
+    return status, headers, body
+
+
+def parse_head(head):
+    """(Request without its body, keep_alive) from the request line and headers"""
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed request line.") from None
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed header.")
+        headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    path = url.path.rstrip("/") or "/"
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    return Request(method, path, parse_qs(url.query), headers), keep_alive
+
+
+def format_response(status, headers, body, keep_alive, head_only=False):
+    status = HTTPStatus(status)
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    if status not in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+        lines.append("Content-Type: application/json")
+        lines.append(f"Content-Length: {len(body)}")
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+    return head if head_only else head + body
+
+
+class ApiServer:
+    """HTTP/1.1 server for ROUTES on asyncio streams.
+
+    Connections are kept alive and their requests answered in order.  The
+    event loop only reads and writes; handlers, and the blocking engine
+    calls in them, run on a pool of the given number of threads.
+    """
+
+    def __init__(self, host=API_HOST, port=API_PORT, threads=API_THREADS):
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="api")
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        return self.server
+
+    async def serve(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=False)
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                                  KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self.send_error(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                          "Request headers too large.")
+                    return
+                try:
+                    request, keep_alive = parse_head(head)
+                    if "transfer-encoding" in request.headers:
+                        raise ApiError(HTTPStatus.LENGTH_REQUIRED, "Send a Content-Length.")
+                    try:
+                        length = int(request.headers.get("content-length", "0"))
+                    except ValueError:
+                        raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.") from None
+                    if not 0 <= length <= MAX_BODY:
+                        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                       f"Request bodies are limited to {MAX_BODY} bytes.")
+                except ApiError as e:
+                    await self.send_error(writer, e.status, str(e))
+                    return
+                if length:
+                    request.body = await reader.readexactly(length)
+
+                status, headers, body = await loop.run_in_executor(self.executor, respond,
+                                                                   request)
+                writer.write(format_response(status, headers, body, keep_alive,
+                                             head_only=request.method == "HEAD"))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def send_error(self, writer, status, message):
+        """Answer a request that cannot be read, then close the connection"""
+        body = json.dumps({"error": message}).encode()
+        writer.write(format_response(status, {}, body, keep_alive=False))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the task engine as JSON over HTTP.")
+    parser.add_argument("--host", default=API_HOST,
+                        help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=API_PORT,
+                        help="port to listen on (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=API_THREADS,
+                        help="threads running database calls (default: %(default)s)")
+    parser.add_argument("--user", help="user whose tasks are served "
+                                       "(default: TASK_SCHEDULER_USER or the default user)")
+    args = parser.parse_args(argv)
+
+    engine.init_database()
+    if args.user:
+        engine.set_current_user(args.user)
+    # Keeps the task cache behind GET /tasks/ID in step with other clients
+    engine.start_task_listener()
+    server = ApiServer(args.host, args.port, args.threads)
+    print(f"Serving tasks of {engine.current_user()} on http://{args.host}:{args.port}",
+          flush=True)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        engine.close_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Benchmarks for the task engine and task list rendering.
+
+Seeds synthetic tasks at each size, times the engine operations the app
+relies on and records tracemalloc memory for each, then writes the
+results as JSON.  Pass a previous results file to --compare to flag
+regressions:
+
+    python benchmark.py --sizes 1000 100000 --output before.json
+    python benchmark.py --sizes 1000 100000 --compare before.json
+
+The default SQLite backend runs against a throwaway file.  With
+--storage postgresql the configured database is used: tasks are seeded
+for a BENCHMARK_USER of their own and deleted again afterwards, but
+other users' tasks share the tables and indexes and will affect the
+timings.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import engine
+from db.storage import configure_storage, get_storage
+
+# Task counts seeded by default
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+# Timed runs per benchmark; one more run is made under tracemalloc
+DEFAULT_REPEAT = 5
+
+# Tasks added (and deleted) one at a time per add_task/delete_task run
+ADD_OPS = 200
+
+# Rows per bulk insert while seeding
+SEED_BATCH = 10000
+
+# Treeview population is capped; Tk takes minutes for a million rows
+TREEVIEW_MAX_ROWS = 100000
+
+# A benchmark whose median time grows by more than this factor is a regression
+REGRESSION_THRESHOLD = 1.2
+
+# Title prefix of seeded tasks
+SEED_PREFIX = "[bench] "
+
+# User owning the seeded tasks, so cleanup never touches anyone else's
+BENCHMARK_USER = "benchmark"
+
+SEED_COLUMNS = ("owner_id", "title", "description", "priority", "deadline", "completed",
+                "completed_at")
+
+# Words used in seeded descriptions, so searches match many tasks
+WORDS = ("report", "invoice", "meeting", "deploy", "review", "backup", "email",
+         "budget", "design", "release")
+
+# Keywords searched by the search benchmark: common, specific and absent
+SEARCH_KEYWORDS = ("review", "task 4242", "no-such-task")
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def seed_rows(count, rng, owner_id):
+    """Yield synthetic task rows of the given user in SEED_COLUMNS order"""
+    now = datetime.now().replace(second=0, microsecond=0)
+    for number in range(count):
+        deadline = None
+        if rng.random() > 0.1:
+            deadline = now + timedelta(minutes=rng.randint(-60 * 24 * 30, 60 * 24 * 90))
+        title = f"{SEED_PREFIX}task {number}"
+        description = " ".join(rng.choice(WORDS) for _ in range(6))
+        priority = rng.choice(("Low", "Medium", "High"))
+        completed = rng.random() < 0.3
+        yield (owner_id, title, description, priority, deadline, completed,
+               now if completed else None)
+
+
+def seed_tasks(count, rng):
+    storage = get_storage()
+    rows = seed_rows(count, rng, engine.get_or_create_user(engine.current_user()))
+    while True:
+        batch = [row for _, row in zip(range(SEED_BATCH), rows)]
+        if not batch:
+            break
+        with storage.connection() as conn, conn.cursor() as cur:
+            storage.copy_tasks_in(cur, SEED_COLUMNS, batch)
+            conn.commit()
+    engine.invalidate_statistics()
+
+
+def clear_seeded_tasks():
+    """Delete the seeded tasks of BENCHMARK_USER, the current user"""
+    owner_id = engine.get_or_create_user(engine.current_user())
+    with get_storage().connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM tasks WHERE owner_id = %s AND title LIKE %s",
+                    (owner_id, SEED_PREFIX + "%"))
+        conn.commit()
+    engine.invalidate_statistics()
+
+
+def run_benchmark(name, size, func, ops=1, repeat=DEFAULT_REPEAT):
+    """Time func() repeat times, then run it once more under tracemalloc.
+
+    peak_kib is the most memory allocated at once during the traced run
+    and retained_kib what was still allocated when it returned (caches,
+    or a leak).  Timings come from the untraced runs only, since tracing
+    slows allocation-heavy code down several times.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    median = statistics.median(runs)
+    result = {
+        "name": name,
+        "size": size,
+        "ops": ops,
+        "runs": runs,
+        "min": min(runs),
+        "median": median,
+        "mean": statistics.mean(runs),
+        "per_op": median / ops,
+        "peak_kib": peak / 1024,
+        "retained_kib": retained / 1024,
+    }
+    log(f"  {name:<20} median {median * 1000:10.2f} ms  "
+        f"({result['per_op'] * 1e6:9.1f} us/op)  peak {result['peak_kib']:10.1f} KiB")
+    return result
+
+
+def engine_benchmarks(size, repeat):
+    results = []
+    added = []
+
+    def add_tasks():
+        deadline = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d %H:%M")
+        for number in range(ADD_OPS):
+            row = engine.insert_task_row(f"{SEED_PREFIX}added {number}", "benchmark",
+                                         "Medium", deadline, 30)
+            added.append(row.id)
+
+    def delete_tasks():
+        for _ in range(ADD_OPS):
+            engine.delete_tasks([added.pop()])
+
+    def search():
+        for keyword in SEARCH_KEYWORDS:
+            engine.search_task_rows(keyword)
+
+    def statistics_query():
+        engine.invalidate_statistics()
+        engine.get_task_statistics()
+
+    results.append(run_benchmark("add_task", size, add_tasks, ADD_OPS, repeat))
+    results.append(run_benchmark("delete_task", size, delete_tasks, ADD_OPS, repeat))
+    results.append(run_benchmark("list_tasks", size, engine.get_task_rows, 1, repeat))
+    results.append(run_benchmark("first_page", size,
+                                 lambda: engine.get_task_page(sort="deadline"), 1, repeat))
+    results.append(run_benchmark("search_tasks", size, search, len(SEARCH_KEYWORDS),
+                                 repeat))
+    results.append(run_benchmark("statistics", size, statistics_query, 1, repeat))
+    results.append(run_benchmark("task_queue", size, engine.get_task_queue, 1, repeat))
+    return results
+
+
+def _skipped(name, size, reason):
+    log(f"  {name:<20} skipped: {reason}")
+    return {"name": name, "size": size, "skipped": str(reason)}
+
+
+def treeview_benchmarks(size, repeat):
+    """Time filling the main window's task list with the app's own rendering code.
+
+    Needs a display; returns a skipped record when Tk cannot start.
+    """
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        from main import TaskSchedulerApp
+        root = tk.Tk()
+    except ImportError as e:
+        return [_skipped("treeview_populate", size, e)]
+    except tk.TclError as e:
+        return [_skipped("treeview_populate", size, e)]
+
+    class TreeHarness(TaskSchedulerApp):
+        """Just the list rendering state of TaskSchedulerApp, without the database"""
+
+        def __init__(self, tree):
+            self.tree = tree
+            self.row_views = {}
+            self.countdown_tasks = {}
+
+    root.withdraw()
+    rows = engine.get_task_rows()[:TREEVIEW_MAX_ROWS]
+    columns = ("ID", "Title", "Priority", "Deadline", "Time Remaining", "Status", "Step")
+    harness = TreeHarness(None)
+
+    def populate():
+        if harness.tree is not None:
+            harness.tree.destroy()
+        harness.tree = ttk.Treeview(root, columns=columns, show="headings")
+        harness.row_views = {}
+        harness.countdown_tasks = {}
+        harness.render_tasks(rows)
+
+    try:
+        results = [
+            run_benchmark("treeview_populate", size, populate, len(rows), repeat),
+            run_benchmark("treeview_rerender", size,
+                          lambda: harness.render_tasks(rows), len(rows), repeat),
+        ]
+    finally:
+        root.destroy()
+    return results
+
+
+def open_storage(backend, directory, size):
+    if backend == "sqlite":
+        path = os.path.join(directory, f"benchmark-{size}.db")
+        configure_storage("sqlite", path=path)
+    else:
+        configure_storage("postgresql")
+    # init_db reports on stdout, which may be carrying the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        engine.init_database()
+    engine.set_current_user(BENCHMARK_USER)
+    if backend != "sqlite":
+        clear_seeded_tasks()
+
+
+def run(sizes, backend, repeat, treeview=True):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            log(f"{size} tasks ({backend})")
+            open_storage(backend, directory, size)
+            try:
+                start = time.perf_counter()
+                seed_tasks(size, random.Random(size))
+                elapsed = time.perf_counter() - start
+                results.append({"name": "seed", "size": size, "ops": size,
+                                "runs": [elapsed], "min": elapsed, "median": elapsed,
+                                "mean": elapsed, "per_op": elapsed / size})
+                log(f"  {'seed':<20} {elapsed:.2f} s")
+                results.extend(engine_benchmarks(size, repeat))
+                if treeview:
+                    results.extend(treeview_benchmarks(size, repeat))
+            finally:
+                if backend != "sqlite":
+                    clear_seeded_tasks()
+                engine.close_database()
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Log median changes against a baseline results dict; returns the regressions"""
+    before = {(r["name"], r["size"]): r for r in baseline["results"] if "median" in r}
+    regressions = []
+    for result in results:
+        old = before.get((result["name"], result["size"]))
+        if old is None or "median" not in result or not old["median"]:
+            continue
+        ratio = result["median"] / old["median"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(result)
+        log(f"{result['name']:<20} {result['size']:>8}  {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="task counts to seed (default: %(default)s)")
+    parser.add_argument("--storage", choices=("sqlite", "postgresql"), default="sqlite",
+                        help="storage backend to benchmark (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="timed runs per benchmark (default: %(default)s)")
+    parser.add_argument("--no-treeview", action="store_true",
+                        help="skip the Treeview population benchmarks")
+    parser.add_argument("--output", default="-",
+                        help="file to write JSON results to (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="earlier JSON results; exit 1 if any benchmark regressed")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown factor counted as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.storage, args.repeat, treeview=not args.no_treeview)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "repeat": args.repeat,
+            "sizes": args.sizes,
+        },
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
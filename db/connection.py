@@ -1,11 +1,272 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+# Server settings for the PostgreSQL backend; each can be overridden with a
+# TASK_SCHEDULER_DB_<KEY> environment variable, e.g. TASK_SCHEDULER_DB_HOST
+DB_CONFIG = {
+    key: os.environ.get(f"TASK_SCHEDULER_DB_{key.upper()}", default)
+    for key, default in {
+        "dbname": "task_scheduler_db",
+        "user": "postgres",
+        "password": "cos101",
+        "host": "localhost",
+        "port": "5432",
+    }.items()
+}
+
+# Pool sizing used by the shared pool returned from get_pool()
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 10
+POOL_IDLE_TIMEOUT = 300      # seconds before a surplus idle connection is closed
+POOL_CHECKOUT_TIMEOUT = 30   # seconds to wait for a free connection
+POOL_PING_AFTER = 5          # ping connections idle longer than this on checkout
 
 
 def get_connection():
-    return psycopg2.connect(
-        dbname="task_scheduler_db",
-        user="postgres",
-        password="cos101",
-        host="localhost",
-        port="5432"
-    )
+    """Open a new, unpooled database connection"""
+    return psycopg2.connect(**DB_CONFIG)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of psycopg2 connections.
+
+    Connections are handed out most-recently-used first so a small set stays
+    warm while surplus ones age out after idle_timeout.  A connection that
+    has been idle for longer than ping_after is checked with SELECT 1 before
+    it is returned, and broken connections are replaced transparently.
+    """
+
+    def __init__(self, minconn=POOL_MIN_SIZE, maxconn=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT, timeout=POOL_CHECKOUT_TIMEOUT,
+                 ping_after=POOL_PING_AFTER, connect=get_connection):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool sizes must satisfy 0 <= minconn <= maxconn, maxconn >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._connect = connect
+
+        self._cond = threading.Condition()
+        self._idle = []        # stack of (connection, last_used)
+        self._size = 0         # open connections, idle + checked out
+        self._pids = {}        # open connection -> server process id
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "misses": 0,       # checkouts that had to open a new connection
+            "waits": 0,        # checkouts that had to wait for a free slot
+            "wait_time": 0.0,  # total seconds spent waiting
+            "discarded": 0,    # connections dropped as broken or expired
+        }
+
+        for _ in range(minconn):
+            conn = self._open()
+            self._idle.append((conn, time.monotonic()))
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._size += 1
+            self._pids[conn] = conn.get_backend_pid()
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._pids.pop(conn, None)
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def _prune_idle(self, now):
+        """Close idle connections past idle_timeout, keeping minconn open (lock held)"""
+        expired = []
+        keep = []
+        for conn, last_used in self._idle:
+            if (now - last_used > self.idle_timeout
+                    and self._size - len(expired) > self.minconn):
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        return expired
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        status = conn.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if idle_for < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check out a connection, waiting up to timeout for a free slot"""
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                expired = self._prune_idle(time.monotonic())
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    action = "reuse"
+                elif self._size < self.maxconn:
+                    self._size += 1  # reserve the slot before connecting
+                    action = "open"
+                else:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        raise PoolError(
+                            f"no free connection within {self.timeout}s "
+                            f"(pool size {self.maxconn})")
+                    waited = True
+                    self._cond.wait(remaining)
+                    action = None
+
+            for stale in expired:
+                self._discard(stale)
+
+            if action == "reuse":
+                if self._is_healthy(conn, time.monotonic() - last_used):
+                    break
+                self._discard(conn)
+            elif action == "open":
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats["misses"] += 1
+                    self._pids[conn] = conn.get_backend_pid()
+                break
+
+        with self._cond:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time"] += time.monotonic() - started
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool, closing it if broken or asked to"""
+        if not close and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        if close or conn.closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                self._pids.pop(conn, None)
+                conn.close()
+                self._size -= 1
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and always returns it.
+
+        Any transaction left open is rolled back on return, so callers must
+        commit explicitly as before.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except extensions.QueryCanceledError:
+            # Cancelled or timed-out statements leave the connection usable
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def stats(self):
+        """Snapshot of pool counters and current occupancy"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+        stats["avg_wait"] = (stats["wait_time"] / stats["waits"]
+                             if stats["waits"] else 0.0)
+        return stats
+
+    def backend_pids(self):
+        """Server process ids of open connections, to recognise our own NOTIFYs"""
+        with self._cond:
+            return frozenset(self._pids.values())
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            for conn, _ in idle:
+                self._pids.pop(conn, None)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Shared pool used by engine.py and main.py, created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def connection():
+    """Shortcut for get_pool().connection()"""
+    return get_pool().connection()
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
@@ -1,30 +1,471 @@
-import psycopg2
-from db.connection import get_connection
+import os
+
+from db.storage import DB_ERRORS, SEARCH_DOCUMENT, get_storage
+
+# NOTIFY channel announcing changed task ids; a statement changing more
+# than TASK_CHANGES_MAX_IDS tasks sends {"reset": true} instead, keeping
+# payloads well under PostgreSQL's 8000 byte limit
+TASK_CHANGES_CHANNEL = "task_changes"
+TASK_CHANGES_MAX_IDS = 500
+
+# User owning the tasks created before there were user accounts
+DEFAULT_USER = "default"
+
+# Hash partitions by owner for a new PostgreSQL tasks table; 0 keeps a
+# single table.  Only read when the tasks table is first created.
+TASK_PARTITIONS = int(os.environ.get("TASK_SCHEDULER_PARTITIONS", "0"))
 
 
 def init_db():
-    conn = get_connection()
+    storage = get_storage()
+    with storage.connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                default_owner = create_users(cur, storage)
+                if storage.name == "sqlite":
+                    create_sqlite_tables(cur)
+                else:
+                    create_postgres_tables(cur)
+                add_owner_column(cur, storage, "tasks", default_owner)
+                add_completed_at_column(cur, storage)
+                # Overdue counts and deadline reminders only look at one
+                # user's pending tasks with a deadline
+                cur.execute("DROP INDEX IF EXISTS tasks_pending_deadline_idx")
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS tasks_owner_pending_deadline_idx
+                    ON tasks (owner_id, deadline) WHERE NOT completed
+                """)
+                create_sort_indexes(cur, storage)
+                create_task_dependencies(cur, storage, default_owner)
+                create_task_archive(cur)
+                if storage.name == "postgresql":
+                    create_task_counters(cur)
+                    create_change_notifications(cur)
+                    create_search_indexes(cur)
+                conn.commit()
+                print("Database initialized successfully!")
+        except Exception as e:
+            print(f"Database initialization error: {e}")
+            conn.rollback()
+
+
+def create_users(cur, storage):
+    """The users table; returns the id of DEFAULT_USER, creating it if needed"""
+    if storage.name == "sqlite":
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+            )
+        """)
+    else:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    cur.execute("INSERT INTO users (name) VALUES (%s) ON CONFLICT (name) DO NOTHING",
+                (DEFAULT_USER,))
+    cur.execute("SELECT id FROM users WHERE name = %s", (DEFAULT_USER,))
+    return cur.fetchone()[0]
+
+
+def create_postgres_tables(cur):
+    """The tasks table for PostgreSQL, hash partitioned by owner if TASK_PARTITIONS is set.
+
+    A partitioned table's primary key has to include the partition key, so
+    it is (id, owner_id) there; ids still come from one sequence and stay
+    unique across partitions.
+    """
+    # Create table only if it doesn't exist (preserves existing data)
+    if TASK_PARTITIONS:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id SERIAL,
+                owner_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+                title TEXT NOT NULL,
+                description TEXT,
+                priority TEXT CHECK (priority IN ('Low', 'Medium', 'High')),
+                deadline TIMESTAMP,
+                duration INTEGER CHECK (duration > 0),
+                dependency_level INTEGER NOT NULL DEFAULT 0,
+                completed BOOLEAN DEFAULT FALSE,
+                completed_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, owner_id)
+            ) PARTITION BY HASH (owner_id)
+        """)
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = 'tasks'::regclass")
+        if cur.fetchone()[0] == "p":
+            for remainder in range(TASK_PARTITIONS):
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS tasks_p{remainder} PARTITION OF tasks
+                    FOR VALUES WITH (MODULUS {TASK_PARTITIONS}, REMAINDER {remainder})
+                """)
+    else:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id SERIAL PRIMARY KEY,
+                owner_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+                title TEXT NOT NULL,
+                description TEXT,
+                priority TEXT CHECK (priority IN ('Low', 'Medium', 'High')),
+                deadline TIMESTAMP,
+                duration INTEGER CHECK (duration > 0),
+                dependency_level INTEGER NOT NULL DEFAULT 0,
+                completed BOOLEAN DEFAULT FALSE,
+                completed_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    # Estimated minutes of work, used to score tasks for scheduling
+    cur.execute("""
+        ALTER TABLE tasks ADD COLUMN IF NOT EXISTS
+        duration INTEGER CHECK (duration > 0)
+    """)
+    # Position in the prerequisite graph, see create_task_dependencies
+    cur.execute("""
+        ALTER TABLE tasks ADD COLUMN IF NOT EXISTS
+        dependency_level INTEGER NOT NULL DEFAULT 0
+    """)
+
+
+def create_sqlite_tables(cur):
+    """The tasks table for SQLite.
+
+    Column types are declared TIMESTAMP and BOOLEAN so db/sqlite.py
+    converts them back to datetime and bool; created_at is local time,
+    as PostgreSQL's CURRENT_TIMESTAMP is for a timestamp column.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT CHECK (priority IN ('Low', 'Medium', 'High')),
+            deadline TIMESTAMP,
+            duration INTEGER CHECK (duration > 0),
+            dependency_level INTEGER NOT NULL DEFAULT 0,
+            completed BOOLEAN NOT NULL DEFAULT FALSE,
+            completed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+
+
+def column_exists(cur, storage, table, column):
+    if storage.name == "sqlite":
+        cur.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cur.fetchall())
+    cur.execute("""
+        SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = %s AND column_name = %s)
+    """, (table, column))
+    return cur.fetchone()[0]
+
+
+def add_owner_column(cur, storage, table, default_owner):
+    """Give a table from before user accounts an owner_id, owned by default_owner.
+
+    Dependency edges take the owner of their task.  SQLite cannot add a
+    NOT NULL column to an existing table, so there the column stays
+    nullable; engine.py always sets it.
+    """
+    if column_exists(cur, storage, table, "owner_id"):
+        return
+    cur.execute(f"""
+        ALTER TABLE {table} ADD COLUMN owner_id INTEGER
+        REFERENCES users (id) ON DELETE CASCADE
+    """)
+    if table == "tasks":
+        cur.execute("UPDATE tasks SET owner_id = %s", (default_owner,))
+    else:
+        cur.execute(f"""
+            UPDATE {table} SET owner_id = (
+                SELECT owner_id FROM tasks WHERE tasks.id = {table}.task_id)
+        """)
+    if storage.name == "postgresql":
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN owner_id SET NOT NULL")
+
+
+def add_completed_at_column(cur, storage):
+    """Record when each task was completed, which decides when it is archived.
+
+    Tasks completed before the column existed are taken to have been
+    completed when they were created.
+    """
+    if column_exists(cur, storage, "tasks", "completed_at"):
+        return
+    cur.execute("ALTER TABLE tasks ADD COLUMN completed_at TIMESTAMP")
+    cur.execute("UPDATE tasks SET completed_at = created_at WHERE completed")
+
+
+def create_sort_indexes(cur, storage):
+    """Index every task list order so sorted pages are index range scans.
+
+    Each index starts with owner_id, so a user's list only reads their own
+    tasks, and ends in id, matching the total orders used for keyset
+    pagination.  They are built on the storage backend's sort key
+    expressions, the same ones engine.py sorts by.  The unique (owner_id,
+    id) index also lets dependency edges reference a task with its owner.
+    """
+    # Superseded by the owner-led indexes below
+    for name in ("tasks_deadline_id_idx", "tasks_deadline_sort_idx",
+                 "tasks_completed_sort_idx", "tasks_priority_sort_idx",
+                 "tasks_title_sort_idx", "tasks_dependency_sort_idx"):
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS tasks_owner_id_idx ON tasks (owner_id, id)")
+    deadline = storage.deadline_sort_key
+    indexes = {
+        "tasks_owner_deadline_sort_idx": f"owner_id, ({deadline}), id",
+        "tasks_owner_completed_sort_idx": f"owner_id, completed, ({deadline}), id",
+        "tasks_owner_priority_sort_idx": (f"owner_id, ({storage.priority_sort_key}), "
+                                          f"({deadline}), id"),
+        "tasks_owner_title_sort_idx": f"owner_id, ({storage.title_sort_key}), id",
+        "tasks_owner_dependency_sort_idx": f"owner_id, dependency_level, ({deadline}), id",
+    }
+    for name, columns in indexes.items():
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON tasks ({columns})")
+    # The pending-only list in deadline order reads just the pending tasks
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS tasks_owner_pending_sort_idx
+        ON tasks (owner_id, ({deadline}), id) WHERE NOT completed
+    """)
+
+
+def create_task_dependencies(cur, storage, default_owner):
+    """Store prerequisite edges between tasks.
+
+    A row (owner_id, task_id, depends_on) means depends_on must be done
+    before task_id.  Both tasks belong to owner_id: the foreign keys
+    include it, so edges never cross users.  engine.add_dependency keeps
+    tasks.dependency_level above the level of every prerequisite, so
+    ordering by level is a topological order.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS task_dependencies (
+            owner_id INTEGER NOT NULL,
+            task_id INTEGER NOT NULL,
+            depends_on INTEGER NOT NULL,
+            PRIMARY KEY (owner_id, task_id, depends_on),
+            FOREIGN KEY (owner_id, task_id) REFERENCES tasks (owner_id, id)
+                ON DELETE CASCADE,
+            FOREIGN KEY (owner_id, depends_on) REFERENCES tasks (owner_id, id)
+                ON DELETE CASCADE,
+            CHECK (task_id <> depends_on)
+        )
+    """)
+    add_owner_column(cur, storage, "task_dependencies", default_owner)
+    # The primary key serves prerequisite lookups; this serves dependents
+    cur.execute("DROP INDEX IF EXISTS task_dependencies_depends_on_idx")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS task_dependencies_owner_depends_on_idx
+        ON task_dependencies (owner_id, depends_on)
+    """)
+
+
+def create_task_archive(cur):
+    """Hold completed tasks moved out of tasks by engine.archive_completed_tasks.
+
+    The table has the same columns as tasks, so rows move between the two
+    unchanged and keep their ids.  It has none of the triggers of tasks:
+    archived tasks are not counted in the statistics and archiving shows up
+    to other clients as a delete.  Its only index serves paging through
+    one user's archive, newest first.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            owner_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT,
+            deadline TIMESTAMP,
+            duration INTEGER,
+            dependency_level INTEGER NOT NULL DEFAULT 0,
+            completed BOOLEAN NOT NULL DEFAULT TRUE,
+            completed_at TIMESTAMP,
+            created_at TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS tasks_archive_owner_id_idx
+        ON tasks_archive (owner_id, id)
+    """)
+    # Finds the tasks due for archiving without reading the pending ones
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS tasks_owner_completed_at_idx
+        ON tasks (owner_id, completed_at) WHERE completed
+    """)
+
+
+def create_task_counters(cur):
+    """Maintain each user's total/completed task counts in a summary table.
+
+    Statement-level triggers with transition tables keep the counts current,
+    so bulk statements update the summary once per user rather than once
+    per row.  Users without a row have no tasks.
+    """
+    # The one-row table from before user accounts is rebuilt per owner
+    cur.execute("""
+        SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'task_counters' AND column_name = 'id')
+    """)
+    if cur.fetchone()[0]:
+        cur.execute("DROP TABLE task_counters")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS task_counters (
+            owner_id INTEGER PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+            total BIGINT NOT NULL,
+            completed BIGINT NOT NULL
+        )
+    """)
+    cur.execute("""
+        INSERT INTO task_counters (owner_id, total, completed)
+        SELECT owner_id, COUNT(*), COUNT(*) FILTER (WHERE completed)
+        FROM tasks GROUP BY owner_id
+        ON CONFLICT (owner_id) DO NOTHING
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION task_counters_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO task_counters AS c (owner_id, total, completed)
+                SELECT owner_id, COUNT(*), COUNT(*) FILTER (WHERE completed)
+                FROM new_rows GROUP BY owner_id
+                ON CONFLICT (owner_id) DO UPDATE SET
+                    total = c.total + EXCLUDED.total,
+                    completed = c.completed + EXCLUDED.completed;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE task_counters c SET
+                    total = c.total - d.total,
+                    completed = c.completed - d.completed
+                FROM (SELECT owner_id, COUNT(*) AS total,
+                             COUNT(*) FILTER (WHERE completed) AS completed
+                      FROM old_rows GROUP BY owner_id) d
+                WHERE c.owner_id = d.owner_id;
+            ELSIF TG_OP = 'UPDATE' THEN
+                UPDATE task_counters c SET completed = c.completed + d.change
+                FROM (SELECT owner_id, SUM(change) AS change
+                      FROM (SELECT owner_id, 1 AS change FROM new_rows WHERE completed
+                            UNION ALL
+                            SELECT owner_id, -1 FROM old_rows WHERE completed) changes
+                      GROUP BY owner_id) d
+                WHERE c.owner_id = d.owner_id AND d.change <> 0;
+            ELSE
+                UPDATE task_counters SET total = 0, completed = 0;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    triggers = {
+        "tasks_counters_insert": "AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_rows",
+        "tasks_counters_delete": "AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_rows",
+        "tasks_counters_update": ("AFTER UPDATE ON tasks "
+                                  "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        "tasks_counters_truncate": "AFTER TRUNCATE ON tasks",
+    }
+    for name, timing in triggers.items():
+        cur.execute(f"DROP TRIGGER IF EXISTS {name} ON tasks")
+        cur.execute(f"""
+            CREATE TRIGGER {name} {timing}
+            FOR EACH STATEMENT EXECUTE FUNCTION task_counters_apply()
+        """)
+
+
+def create_change_notifications(cur):
+    """NOTIFY TASK_CHANGES_CHANNEL with the ids of tasks each statement changed.
+
+    One notification is sent per owner of the changed tasks, so listeners
+    (task_cache.py) can skip other users' changes.  Notifications are
+    delivered on commit, so listeners only see committed changes and can
+    reload the listed tasks.
+    """
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION tasks_notify_owner(owner INTEGER, ids INTEGER[])
+        RETURNS void AS $$
+        BEGIN
+            IF cardinality(ids) > {TASK_CHANGES_MAX_IDS} THEN
+                PERFORM pg_notify('{TASK_CHANGES_CHANNEL}',
+                                  json_build_object('owner', owner, 'reset', true)::text);
+            ELSE
+                PERFORM pg_notify('{TASK_CHANGES_CHANNEL}',
+                                  json_build_object('owner', owner, 'ids', ids)::text);
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION tasks_notify_changes() RETURNS trigger AS $$
+        DECLARE
+            changed RECORD;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                PERFORM pg_notify('{TASK_CHANGES_CHANNEL}', '{{"reset": true}}');
+            ELSIF TG_OP = 'DELETE' THEN
+                FOR changed IN
+                    SELECT owner_id, (array_agg(id))[1:{TASK_CHANGES_MAX_IDS + 1}] AS ids
+                    FROM old_rows GROUP BY owner_id
+                LOOP
+                    PERFORM tasks_notify_owner(changed.owner_id, changed.ids);
+                END LOOP;
+            ELSE
+                FOR changed IN
+                    SELECT owner_id, (array_agg(id))[1:{TASK_CHANGES_MAX_IDS + 1}] AS ids
+                    FROM new_rows GROUP BY owner_id
+                LOOP
+                    PERFORM tasks_notify_owner(changed.owner_id, changed.ids);
+                END LOOP;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    triggers = {
+        "tasks_notify_insert": "AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_rows",
+        "tasks_notify_delete": "AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_rows",
+        "tasks_notify_update": "AFTER UPDATE ON tasks REFERENCING NEW TABLE AS new_rows",
+        "tasks_notify_truncate": "AFTER TRUNCATE ON tasks",
+    }
+    for name, timing in triggers.items():
+        cur.execute(f"DROP TRIGGER IF EXISTS {name} ON tasks")
+        cur.execute(f"""
+            CREATE TRIGGER {name} {timing}
+            FOR EACH STATEMENT EXECUTE FUNCTION tasks_notify_changes()
+        """)
+
+
+def create_search_indexes(cur):
+    """Index title and description for search.
+
+    Trigram GIN indexes let ILIKE '%term%' avoid a sequential scan; when
+    the pg_trgm extension cannot be installed a full-text GIN index is
+    created instead and search switches to tsquery matching.
+    """
+    cur.execute("SAVEPOINT search_indexes")
     try:
-        with conn.cursor() as cur:
-            # Create table only if it doesn't exist (preserves existing data)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id SERIAL PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    priority TEXT CHECK (priority IN ('Low', 'Medium', 'High')),
-                    deadline TIMESTAMP,
-                    completed BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
-            print("Database initialized successfully!")
-    except Exception as e:
-        print(f"Database initialization error: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS tasks_title_trgm_idx
+            ON tasks USING gin (title gin_trgm_ops)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS tasks_description_trgm_idx
+            ON tasks USING gin (description gin_trgm_ops)
+        """)
+    except DB_ERRORS as e:
+        cur.execute("ROLLBACK TO SAVEPOINT search_indexes")
+        print(f"pg_trgm unavailable, using full-text search index: {e}")
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS tasks_search_fts_idx
+            ON tasks USING gin ({SEARCH_DOCUMENT})
+        """)
+    cur.execute("RELEASE SAVEPOINT search_indexes")
 
 
 if __name__ == "__main__":
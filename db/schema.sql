@@ -1,10 +1,90 @@
+-- PostgreSQL tables and indexes as created by db/init_db.py (without
+-- TASK_SCHEDULER_PARTITIONS); init_db also adds the task_counters and
+-- change notification triggers and the search indexes
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS tasks (
     id SERIAL PRIMARY KEY,
+    owner_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
     title TEXT NOT NULL,
     description TEXT,
     priority TEXT CHECK (priority IN ('Low', 'Medium', 'High')),
-    deadline DATE,
+    deadline TIMESTAMP,
     duration INTEGER CHECK (duration > 0),
+    dependency_level INTEGER NOT NULL DEFAULT 0,
     completed BOOLEAN DEFAULT FALSE,
+    completed_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- Overdue counts and deadline reminders only look at one user's pending
+-- tasks with a deadline
+CREATE INDEX IF NOT EXISTS tasks_owner_pending_deadline_idx
+    ON tasks (owner_id, deadline) WHERE NOT completed;
+
+-- One index per task list order (column-header sort and keyset pagination),
+-- each led by the owner
+CREATE UNIQUE INDEX IF NOT EXISTS tasks_owner_id_idx ON tasks (owner_id, id);
+CREATE INDEX IF NOT EXISTS tasks_owner_deadline_sort_idx
+    ON tasks (owner_id, (COALESCE(deadline, 'infinity')), id);
+CREATE INDEX IF NOT EXISTS tasks_owner_completed_sort_idx
+    ON tasks (owner_id, completed, (COALESCE(deadline, 'infinity')), id);
+CREATE INDEX IF NOT EXISTS tasks_owner_priority_sort_idx
+    ON tasks (owner_id,
+              (CASE priority WHEN 'High' THEN 0 WHEN 'Medium' THEN 1
+                             WHEN 'Low' THEN 2 ELSE 3 END),
+              (COALESCE(deadline, 'infinity')), id);
+CREATE INDEX IF NOT EXISTS tasks_owner_title_sort_idx
+    ON tasks (owner_id, (lower(title) COLLATE "C"), id);
+CREATE INDEX IF NOT EXISTS tasks_owner_dependency_sort_idx
+    ON tasks (owner_id, dependency_level, (COALESCE(deadline, 'infinity')), id);
+CREATE INDEX IF NOT EXISTS tasks_owner_pending_sort_idx
+    ON tasks (owner_id, (COALESCE(deadline, 'infinity')), id) WHERE NOT completed;
+
+-- Prerequisites: depends_on must be done before task_id; both tasks
+-- belong to owner_id
+CREATE TABLE IF NOT EXISTS task_dependencies (
+    owner_id INTEGER NOT NULL,
+    task_id INTEGER NOT NULL,
+    depends_on INTEGER NOT NULL,
+    PRIMARY KEY (owner_id, task_id, depends_on),
+    FOREIGN KEY (owner_id, task_id) REFERENCES tasks (owner_id, id)
+        ON DELETE CASCADE,
+    FOREIGN KEY (owner_id, depends_on) REFERENCES tasks (owner_id, id)
+        ON DELETE CASCADE,
+    CHECK (task_id <> depends_on)
+);
+CREATE INDEX IF NOT EXISTS task_dependencies_owner_depends_on_idx
+    ON task_dependencies (owner_id, depends_on);
+
+-- Completed tasks moved out of tasks by engine.archive_completed_tasks
+CREATE TABLE IF NOT EXISTS tasks_archive (
+    id INTEGER PRIMARY KEY,
+    owner_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    description TEXT,
+    priority TEXT,
+    deadline TIMESTAMP,
+    duration INTEGER,
+    dependency_level INTEGER NOT NULL DEFAULT 0,
+    completed BOOLEAN NOT NULL DEFAULT TRUE,
+    completed_at TIMESTAMP,
+    created_at TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tasks_archive_owner_id_idx
+    ON tasks_archive (owner_id, id);
+-- Finds the tasks due for archiving without reading the pending ones
+CREATE INDEX IF NOT EXISTS tasks_owner_completed_at_idx
+    ON tasks (owner_id, completed_at) WHERE completed;
+
+-- Each user's task counts, kept current by triggers on tasks
+CREATE TABLE IF NOT EXISTS task_counters (
+    owner_id INTEGER PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+    total BIGINT NOT NULL,
+    completed BIGINT NOT NULL
+);
@@ -0,0 +1,159 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+# Database file used by the SQLite backend; set TASK_SCHEDULER_SQLITE_PATH
+# to keep it elsewhere
+SQLITE_PATH = os.environ.get(
+    "TASK_SCHEDULER_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tasks.db"))
+
+# Seconds a writer waits for another connection's write lock
+SQLITE_BUSY_TIMEOUT = 5
+
+# Compiled statements each connection keeps for reuse, keyed by SQL text
+SQLITE_STATEMENT_CACHE = 256
+
+# Timestamps are stored as ISO text and booleans as 0/1; columns declared
+# TIMESTAMP or BOOLEAN come back as datetime and bool, like psycopg2 returns
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: value not in (b"0", b""))
+
+_PARAMETER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+@lru_cache(maxsize=256)
+def _translate(sql):
+    """Rewrite psycopg2 placeholders (%s, %(name)s, %%) in sqlite3 style"""
+    def replace(match):
+        if match.group(1):
+            return ":" + match.group(1)
+        return "?" if match.group(0) == "%s" else "%"
+    return _PARAMETER.sub(replace, sql)
+
+
+class Cursor:
+    """sqlite3 cursor that accepts the psycopg2 placeholders engine.py uses
+    and works as a context manager"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_translate(sql), params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(_translate(sql), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+class Connection:
+    """sqlite3 connection in WAL mode with a psycopg2-like surface"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT,
+                                     detect_types=sqlite3.PARSE_DECLTYPES,
+                                     cached_statements=SQLITE_STATEMENT_CACHE,
+                                     check_same_thread=False)
+        self.closed = False
+        # WAL lets readers run alongside a writer; NORMAL sync is safe in WAL
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def cursor(self):
+        return Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def cancel(self):
+        """Abort the statement running on this connection, from any thread"""
+        self._conn.interrupt()
+
+    def close(self):
+        self.closed = True
+        self._conn.close()
+
+
+class SQLiteDatabase:
+    """One connection per thread to a SQLite file.
+
+    connection() hands the calling thread its own connection, opening it
+    on first use, and rolls back anything left uncommitted when the
+    outermost block exits, as the PostgreSQL pool does.
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = Connection(self.path)
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        self._local.depth += 1
+        try:
+            yield conn
+        finally:
+            self._local.depth -= 1
+            if not self._local.depth and not conn.closed and conn.in_transaction:
+                conn.rollback()
+
+    def stats(self):
+        with self._lock:
+            return {"path": self.path,
+                    "connections": sum(not conn.closed for conn in self._connections)}
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            if not conn.closed:
+                conn.close()
@@ -0,0 +1,406 @@
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from datetime import datetime
+
+try:
+    import psycopg2
+except ImportError:  # only the PostgreSQL backend needs it
+    psycopg2 = None
+
+from db.sqlite import SQLITE_PATH, SQLiteDatabase
+
+# Backend used for task storage: "postgresql" (the shared server configured
+# in db/connection.py) or "sqlite" (a single local file, see db/sqlite.py)
+STORAGE_BACKEND = os.environ.get("TASK_SCHEDULER_STORAGE", "postgresql")
+
+# Errors any backend may raise from a query
+DB_ERRORS = (sqlite3.Error,) + ((psycopg2.Error,) if psycopg2 else ())
+
+# Document indexed for full-text search when pg_trgm is not available;
+# PostgresStorage.search must query the same expression for the index to be used
+SEARCH_DOCUMENT = "to_tsvector('simple', title || ' ' || COALESCE(description, ''))"
+
+# Server-side limit for a single search query, in milliseconds
+SEARCH_TIMEOUT_MS = 5000
+
+# First key of the PostgreSQL advisory locks serialising each user's
+# dependency edits; the second key is the owner id
+DEPENDENCY_LOCK_CLASS = 1
+
+# Columns written by export_tasks; deadline and created_at are formatted
+# as "YYYY-MM-DD HH:MM:SS" so import_tasks reads them back
+EXPORT_COLUMNS = ("id", "title", "description", "priority", "deadline",
+                  "duration", "completed", "created_at")
+
+
+_PARAMETER = re.compile(r"%s|%%")
+
+
+def _numbered_parameters(sql):
+    """Rewrite %s placeholders as $1, $2, ... for PREPARE"""
+    numbers = itertools.count(1)
+    return _PARAMETER.sub(
+        lambda match: f"${next(numbers)}" if match.group(0) == "%s" else "%", sql)
+
+
+def _like_pattern(keyword):
+    return "%" + re.sub(r"([\\%_])", r"\\\1", keyword) + "%"
+
+
+class PostgresStorage:
+    """Tasks in PostgreSQL through the shared pool in db/connection.py.
+
+    Search uses the pg_trgm (or full-text) indexes, statistics read the
+    trigger-maintained task_counters rows, bulk loads use COPY and other
+    clients' changes arrive over LISTEN/NOTIFY.
+    """
+
+    name = "postgresql"
+    supports_notifications = True
+
+    # Sort key expressions for the task list; engine.py orders by these
+    # exact expressions so the indexes from init_db.create_sort_indexes are used
+    deadline_sort_key = "COALESCE(deadline, 'infinity')"
+    priority_sort_key = ("CASE priority WHEN 'High' THEN 0 WHEN 'Medium' THEN 1 "
+                         "WHEN 'Low' THEN 2 ELSE 3 END")
+    title_sort_key = 'lower(title) COLLATE "C"'
+    # Parameter value deadline_sort_key gives tasks without a deadline
+    undated_sort_value = "infinity"
+
+    def __init__(self):
+        if psycopg2 is None:
+            raise RuntimeError("The PostgreSQL backend needs psycopg2 installed; "
+                               "set TASK_SCHEDULER_STORAGE=sqlite to use SQLite.")
+        from db import connection as pg
+        self._pg = pg
+        self.query_canceled = psycopg2.extensions.QueryCanceledError
+        # "trgm" when the pg_trgm indexes exist, otherwise "fts"; detected on first search
+        self._search_method = None
+        # Statement name for each prepared query, and the names already
+        # prepared on each open connection
+        self._statements = {}
+        self._prepared = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def connection(self):
+        return self._pg.connection()
+
+    def listen_connection(self):
+        """A new autocommit connection for LISTEN, outside the pool"""
+        conn = self._pg.get_connection()
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def backend_pids(self):
+        return self._pg.get_pool().backend_pids()
+
+    def stats(self):
+        return self._pg.pool_stats()
+
+    def close(self):
+        self._pg.close_pool()
+
+    def execute_prepared(self, cur, sql, params=()):
+        """Run a fixed query as a server-side prepared statement.
+
+        Each connection PREPAREs a query the first time it runs it and
+        EXECUTEs it after that, so the server parses and plans it once per
+        connection instead of once per call.  sql may only use %s
+        placeholders.
+        """
+        with self._lock:
+            name = self._statements.get(sql)
+            if name is None:
+                name = self._statements[sql] = f"task_query_{len(self._statements) + 1}"
+            prepared = self._prepared.setdefault(cur.connection, set())
+        if name not in prepared:
+            cur.execute(f"PREPARE {name} AS {_numbered_parameters(sql)}")
+            with self._lock:
+                prepared.add(name)
+        if params:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cur.execute(f"EXECUTE {name}")
+
+    def in_ids(self, column):
+        """Condition matching column against the one ids parameter"""
+        return f"{column} = ANY(%s)"
+
+    def ids_param(self, ids):
+        return list(ids)
+
+    def lock_dependencies(self, cur, owner_id):
+        """Serialise one user's dependency edits until the transaction ends.
+
+        Edges never cross users, so other users' edits cannot close a cycle
+        and need not wait.
+        """
+        cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (DEPENDENCY_LOCK_CLASS, owner_id))
+
+    def search(self, cur, columns, keyword, limit, owner_id, table="tasks"):
+        """Run an indexed, relevance-ranked search of one user's tasks.
+
+        With pg_trgm the substring match is served by the trigram GIN indexes
+        and ranked by word similarity; otherwise words are prefix-matched
+        against the full-text GIN index and ranked with ts_rank.  The query is
+        abandoned by the server after SEARCH_TIMEOUT_MS.  tasks_archive has
+        no search indexes, so searching it scans the user's archived rows.
+        """
+        cur.execute("SET LOCAL statement_timeout = %s", (SEARCH_TIMEOUT_MS,))
+        if self._search_method is None:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+            self._search_method = "trgm" if cur.fetchone()[0] else "fts"
+        if self._search_method == "trgm":
+            cur.execute(f"""
+                SELECT {columns}
+                FROM {table}
+                WHERE owner_id = %(owner)s
+                  AND (title ILIKE %(pattern)s OR description ILIKE %(pattern)s)
+                ORDER BY GREATEST(word_similarity(%(keyword)s, title),
+                                  word_similarity(%(keyword)s, COALESCE(description, ''))) DESC,
+                         deadline, id
+                LIMIT %(limit)s
+            """, {"pattern": _like_pattern(keyword), "keyword": keyword, "limit": limit,
+                  "owner": owner_id})
+        else:
+            words = re.findall(r"\w+", keyword)
+            if not words:
+                return []
+            query = " & ".join(f"{word}:*" for word in words)
+            cur.execute(f"""
+                SELECT {columns}
+                FROM {table}, to_tsquery('simple', %(query)s) AS query
+                WHERE owner_id = %(owner)s AND {SEARCH_DOCUMENT} @@ query
+                ORDER BY ts_rank({SEARCH_DOCUMENT}, query) DESC, deadline, id
+                LIMIT %(limit)s
+            """, {"query": query, "limit": limit, "owner": owner_id})
+        return cur.fetchall()
+
+    def move_tasks(self, cur, source, target, columns, where, params):
+        """Move the rows of source matching where into target; returns their ids.
+
+        One statement deletes and inserts, so a row is never in both tables
+        or in neither.
+        """
+        cur.execute(f"""
+            WITH moved AS (DELETE FROM {source} WHERE {where} RETURNING {columns})
+            INSERT INTO {target} ({columns}) SELECT {columns} FROM moved
+            RETURNING id
+        """, params)
+        return [row[0] for row in cur.fetchall()]
+
+    def count_tasks(self, cur, owner_id):
+        """(total, completed, overdue) counts of one user's tasks"""
+        cur.execute("""
+            SELECT COALESCE(c.total, 0), COALESCE(c.completed, 0),
+                   (SELECT COUNT(*) FROM tasks
+                    WHERE owner_id = %(owner)s AND NOT completed
+                      AND deadline < CURRENT_DATE)
+            FROM (SELECT 1) one
+            LEFT JOIN task_counters c ON c.owner_id = %(owner)s
+        """, {"owner": owner_id})
+        return cur.fetchone()
+
+    def copy_tasks_in(self, cur, columns, rows):
+        """Insert rows of the given task columns with COPY FROM STDIN"""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_field(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        cur.copy_expert(f"COPY tasks ({', '.join(columns)}) FROM STDIN", buffer)
+
+    def copy_tasks_out(self, cur, destination, fmt, owner_id, table="tasks"):
+        """Write one user's tasks to destination as CSV or JSON Lines with COPY TO STDOUT"""
+        # COPY takes no parameters, so the owner is bound in Python first
+        query = cur.mogrify(f"""
+            SELECT id, title, description, priority,
+                   to_char(deadline, 'YYYY-MM-DD HH24:MI:SS') AS deadline,
+                   duration, completed,
+                   to_char(created_at, 'YYYY-MM-DD HH24:MI:SS') AS created_at
+            FROM {table} WHERE owner_id = %s ORDER BY id
+        """, (owner_id,)).decode()
+        if fmt == "csv":
+            copy = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)"
+        else:
+            # JSON never contains raw control characters, so CSV mode with
+            # control-character quote/delimiter emits each object untouched
+            copy = (f"COPY (SELECT row_to_json(t) FROM ({query}) t) TO STDOUT "
+                    "WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')")
+        cur.copy_expert(copy, destination)
+        return cur.rowcount
+
+
+def _copy_field(value):
+    """Encode a value for COPY's text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class SQLiteStorage:
+    """Tasks in a local SQLite file in WAL mode, with no server to run.
+
+    The same SQL as PostgreSQL is used where SQLite understands it.  Search
+    is a LIKE scan ranked by title matches, statistics are counted directly,
+    bulk loads use executemany in one transaction, and there are no change
+    notifications, so other clients' edits show up on the next reload.
+    """
+
+    name = "sqlite"
+    supports_notifications = False
+    query_canceled = sqlite3.OperationalError
+
+    deadline_sort_key = "COALESCE(deadline, '9999-12-31 23:59:59')"
+    priority_sort_key = PostgresStorage.priority_sort_key
+    title_sort_key = "lower(title)"
+    undated_sort_value = "9999-12-31 23:59:59"
+
+    def __init__(self, path=SQLITE_PATH):
+        self._db = SQLiteDatabase(path)
+
+    def connection(self):
+        return self._db.connection()
+
+    def listen_connection(self):
+        raise NotImplementedError("SQLite has no change notifications")
+
+    def backend_pids(self):
+        return frozenset()
+
+    def stats(self):
+        return self._db.stats()
+
+    def close(self):
+        self._db.close()
+
+    def execute_prepared(self, cur, sql, params=()):
+        # sqlite3 already keeps each connection's compiled statements cached
+        # by their SQL text (see SQLITE_STATEMENT_CACHE)
+        cur.execute(sql, params)
+
+    def in_ids(self, column):
+        return f"{column} IN (SELECT value FROM json_each(%s))"
+
+    def ids_param(self, ids):
+        return json.dumps(list(ids))
+
+    def lock_dependencies(self, cur, owner_id):
+        # SQLite has one writer at a time anyway; take the write lock now
+        # rather than at the first write
+        cur.execute("BEGIN IMMEDIATE")
+
+    def search(self, cur, columns, keyword, limit, owner_id, table="tasks"):
+        """Case-insensitive substring search of one user's tasks, title matches first"""
+        cur.execute(f"""
+            SELECT {columns}
+            FROM {table}
+            WHERE owner_id = %(owner)s
+              AND (title LIKE %(pattern)s ESCAPE '\\'
+                   OR description LIKE %(pattern)s ESCAPE '\\')
+            ORDER BY title LIKE %(pattern)s ESCAPE '\\' DESC, deadline, id
+            LIMIT %(limit)s
+        """, {"pattern": _like_pattern(keyword), "limit": limit, "owner": owner_id})
+        return cur.fetchall()
+
+    def move_tasks(self, cur, source, target, columns, where, params):
+        # SQLite has no DELETE in WITH; take the write lock first so nothing
+        # changes between the copy and the delete
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(f"INSERT INTO {target} ({columns}) "
+                    f"SELECT {columns} FROM {source} WHERE {where} RETURNING id", params)
+        moved = [row[0] for row in cur.fetchall()]
+        cur.execute(f"DELETE FROM {source} WHERE {where}", params)
+        return moved
+
+    def count_tasks(self, cur, owner_id):
+        cur.execute("""
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE completed),
+                   COUNT(*) FILTER (WHERE NOT completed AND deadline < date('now', 'localtime'))
+            FROM tasks WHERE owner_id = %s
+        """, (owner_id,))
+        return cur.fetchone()
+
+    def copy_tasks_in(self, cur, columns, rows):
+        placeholders = ", ".join(["%s"] * len(columns))
+        cur.executemany(f"INSERT INTO tasks ({', '.join(columns)}) VALUES ({placeholders})",
+                        rows)
+
+    def copy_tasks_out(self, cur, destination, fmt, owner_id, table="tasks"):
+        cur.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM {table} "
+                    "WHERE owner_id = %s ORDER BY id", (owner_id,))
+        writer = csv.writer(destination) if fmt == "csv" else None
+        if writer:
+            writer.writerow(EXPORT_COLUMNS)
+        count = 0
+        for row in cur:
+            row = [value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime)
+                   else value for value in row]
+            if writer:
+                # Booleans as PostgreSQL's CSV writes them
+                writer.writerow(["t" if value is True else "f" if value is False else value
+                                 for value in row])
+            else:
+                destination.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n")
+            count += 1
+        return count
+
+
+BACKENDS = {
+    "postgresql": PostgresStorage,
+    "sqlite": SQLiteStorage,
+}
+
+_storage = None
+_storage_lock = threading.RLock()
+
+
+def configure_storage(backend=None, **options):
+    """Select the storage backend, closing the current one.
+
+    backend defaults to STORAGE_BACKEND; options go to the backend class
+    (e.g. path for SQLite).  Call before anything touches the database.
+    """
+    global _storage
+    backend = backend or STORAGE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend!r} "
+                         f"(expected one of {', '.join(BACKENDS)})")
+    storage = BACKENDS[backend](**options)
+    with _storage_lock:
+        previous, _storage = _storage, storage
+    if previous is not None:
+        previous.close()
+    return storage
+
+
+def get_storage():
+    """The configured storage backend, created on first use"""
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                return configure_storage()
+    return _storage
+
+
+def connection():
+    """Shortcut for get_storage().connection()"""
+    return get_storage().connection()
+
+
+def close_storage():
+    global _storage
+    with _storage_lock:
+        storage, _storage = _storage, None
+    if storage is not None:
+        storage.close()
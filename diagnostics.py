@@ -0,0 +1,110 @@
+import gc
+import os
+import sys
+import tracemalloc
+from collections import Counter
+
+# Setting this environment variable to 1 turns on diagnostics mode in the app
+DIAGNOSTICS_ENV = "TASK_SCHEDULER_DIAGNOSTICS"
+
+# How often diagnostics mode logs a report to stderr
+DIAGNOSTICS_INTERVAL_MS = 60000
+
+# Object types listed in a report, largest growth first
+DIAGNOSTICS_TOP_TYPES = 10
+
+
+def diagnostics_enabled():
+    return os.environ.get(DIAGNOSTICS_ENV, "") not in ("", "0")
+
+
+def object_counts():
+    """Number of live gc-tracked objects of each type name"""
+    gc.collect()
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+def widget_count(widget):
+    """Number of Tk widgets in the tree rooted at widget, itself included"""
+    return 1 + sum(widget_count(child) for child in widget.winfo_children())
+
+
+def tcl_command_count(root):
+    """Number of Tcl commands, which includes every Python callback Tk holds"""
+    return len(root.tk.splitlist(root.tk.call("info", "commands")))
+
+
+def after_count(root):
+    """Number of pending root.after callbacks"""
+    return len(root.tk.splitlist(root.tk.call("after", "info")))
+
+
+class MemoryDiagnostics:
+    """Track object, widget and memory counts across operations.
+
+    snapshot() records the live gc object count per type, the Tk widget,
+    Tcl command and pending after() counts (when given a Tk root), and
+    the memory tracemalloc has traced since the diagnostics were created.
+    report() compares the current snapshot with the first one, per
+    operation counted with operation(), so a leak shows up as a count
+    that keeps growing with the number of operations.
+    """
+
+    def __init__(self, root=None, trace=True):
+        self.root = root
+        self.operations = 0
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.baseline = self.snapshot()
+
+    def operation(self, count=1):
+        self.operations += count
+
+    def snapshot(self):
+        types = object_counts()
+        snapshot = {
+            "operations": self.operations,
+            "objects": sum(types.values()),
+            "types": types,
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot["traced_kib"] = current / 1024
+            snapshot["peak_kib"] = peak / 1024
+        if self.root is not None:
+            snapshot["widgets"] = widget_count(self.root)
+            snapshot["tcl_commands"] = tcl_command_count(self.root)
+            snapshot["after_callbacks"] = after_count(self.root)
+        return snapshot
+
+    def growth(self, snapshot=None):
+        """Counts in snapshot (default: a new one) minus the baseline's"""
+        snapshot = snapshot or self.snapshot()
+        growth = {key: snapshot[key] - self.baseline[key]
+                  for key in snapshot if key != "types" and key in self.baseline}
+        types = Counter(snapshot["types"])
+        types.subtract(self.baseline["types"])
+        growth["types"] = Counter({name: n for name, n in types.items() if n > 0})
+        return growth
+
+    def report(self, snapshot=None):
+        """Multi-line summary of the growth since the baseline"""
+        snapshot = snapshot or self.snapshot()
+        growth = self.growth(snapshot)
+        operations = growth["operations"]
+        lines = [f"Operations: {operations}"]
+        for key in ("objects", "widgets", "tcl_commands", "after_callbacks",
+                    "traced_kib"):
+            if key not in snapshot:
+                continue
+            line = f"{key}: {snapshot[key]:.0f} ({growth[key]:+.0f}"
+            if operations:
+                line += f", {growth[key] / operations:+.3f}/op"
+            lines.append(line + ")")
+        top = growth["types"].most_common(DIAGNOSTICS_TOP_TYPES)
+        if top:
+            lines.append("Growing types: " + ", ".join(f"{name} +{n}" for name, n in top))
+        return "\n".join(lines)
+
+    def log(self, file=None):
+        print(self.report(), file=file or sys.stderr, flush=True)
@@ -1,150 +1,1355 @@
-import psycopg2
-from db.connection import get_connection
-from datetime import datetime
+import bisect
+import csv
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from db.init_db import DEFAULT_USER, init_db
+from db.storage import DB_ERRORS, close_storage, connection, get_storage
+from task_cache import TaskCache, TaskChangeListener
+from datetime import datetime, timedelta
 
+# Default number of rows fetched per page by get_task_page
+PAGE_SIZE = 200
 
-def validate_task(title, description, priority, deadline):
+# Maximum number of ranked results returned by a search
+SEARCH_LIMIT = 200
+
+# Deadline formats accepted by validate_task, most specific first
+DEADLINE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+# Valid rows sent to the database per COPY by import_tasks
+IMPORT_BATCH_SIZE = 5000
+
+# Columns of the rows shown in the main task list, in TaskRow field order
+TASK_ROW_COLUMNS = "id, title, priority, deadline, completed, duration, dependency_level"
+
+# Columns of cached task records: a list row followed by the description
+TASK_RECORD_COLUMNS = TASK_ROW_COLUMNS + ", description"
+
+# Columns moved between tasks and tasks_archive, which have the same layout
+ARCHIVE_COLUMNS = ("id, owner_id, title, description, priority, deadline, duration, "
+                   "dependency_level, completed, completed_at, created_at")
+
+# Completed tasks are moved to the archive by init_database once they were
+# completed more than this many days ago; 0 turns automatic archiving off
+ARCHIVE_AFTER_DAYS = int(os.environ.get("TASK_SCHEDULER_ARCHIVE_DAYS", "0"))
+
+# Orders offered for the task list, as the fields they sort by; each ends in
+# id so the order is total and can be paged with a keyset
+TASK_SORTS = {
+    "id": ("id",),
+    "title": ("title", "id"),
+    "priority": ("priority", "deadline", "id"),
+    "deadline": ("deadline", "id"),
+    "status": ("completed", "deadline", "id"),
+    "dependencies": ("level", "deadline", "id"),
+}
+
+# SQL for each sort field; the storage backend supplies the expressions for
+# title, priority and deadline, and init_db indexes the same ones
+SORT_FIELDS = {
+    "id": "id",
+    "title": "title_sort_key",
+    "priority": "priority_sort_key",
+    "deadline": "deadline_sort_key",
+    "completed": "completed",
+    "level": "dependency_level",
+}
+
+PRIORITY_RANKS = {"High": 0, "Medium": 1, "Low": 2}
+
+# How long before its deadline a task of each priority should be started,
+# on top of its own duration; used by task_score
+PRIORITY_LEAD = {
+    "High": timedelta(days=2),
+    "Medium": timedelta(days=1),
+    "Low": timedelta(0),
+}
+
+# Minutes assumed for tasks that have no duration set
+DEFAULT_DURATION = 60
+
+# Number of tasks returned by TaskQueue.next() by default
+NEXT_UP_COUNT = 10
+
+# Working hours used by schedule_tasks: offsets from midnight and weekdays
+# (0 = Monday)
+WORK_DAY_START = timedelta(hours=9)
+WORK_DAY_END = timedelta(hours=17)
+WORK_DAYS = (0, 1, 2, 3, 4)
+
+# Seconds a cached statistics snapshot is trusted; overdue counts drift with
+# the clock and other clients, so the cache also expires on its own
+STATS_CACHE_TTL = 30
+
+# Cached statistics by owner id, as (stats, expiry time)
+_stats_cache = {"values": {}, "version": 0}
+_stats_lock = threading.Lock()
+
+# Task records by id, written through by this module's mutations and kept
+# in step with other clients by the listener from start_task_listener();
+# only read while that listener runs
+_task_cache = TaskCache()
+_task_listener = None
+
+# User whose tasks are read and written until set_current_user is called
+CURRENT_USER = os.environ.get("TASK_SCHEDULER_USER", DEFAULT_USER)
+
+# (name, id) of the current user; every query below is limited to their tasks
+_current_user = None
+_user_lock = threading.Lock()
+
+
+@dataclass
+class TaskRow:
+    """One task as shown in the task list (TASK_ROW_COLUMNS).
+
+    Every query returning list rows builds these; __slots__ keeps large
+    lists and the task cache compact.
+    """
+    __slots__ = ("id", "title", "priority", "deadline", "completed", "duration",
+                 "dependency_level")
+    id: int
+    title: str
+    priority: str
+    deadline: datetime
+    completed: bool
+    duration: int
+    dependency_level: int
+
+
+@dataclass
+class TaskRecord(TaskRow):
+    """A list row plus the description (TASK_RECORD_COLUMNS); cached by id"""
+    __slots__ = ("description",)
+    description: str
+
+    @classmethod
+    def from_row(cls, row, description):
+        return cls(row.id, row.title, row.priority, row.deadline, row.completed,
+                   row.duration, row.dependency_level, description)
+
+    def task_row(self):
+        return TaskRow(self.id, self.title, self.priority, self.deadline,
+                       self.completed, self.duration, self.dependency_level)
+
+
+def _task_rows(cur):
+    return [TaskRow(*row) for row in cur.fetchall()]
+
+
+def _task_row(cur):
+    row = cur.fetchone()
+    return TaskRow(*row) if row else None
+
+
+def _execute(cur, sql, params=()):
+    """Run one of this module's fixed queries as a prepared statement"""
+    get_storage().execute_prepared(cur, sql, params)
+
+
+def init_database():
+    """Create any missing tables, check the database can be reached, look up
+    the current user (CURRENT_USER unless set_current_user was called) and
+    archive their old completed tasks if ARCHIVE_AFTER_DAYS is set"""
+    init_db()
+    set_current_user(_current_user[0] if _current_user else CURRENT_USER)
+    if ARCHIVE_AFTER_DAYS:
+        archive_completed_tasks(ARCHIVE_AFTER_DAYS)
+
+
+def close_database():
+    """Stop the change listener and close the storage backend's connections"""
+    stop_task_listener()
+    close_storage()
+
+
+def get_or_create_user(name):
+    """Id of the named user, adding them to the users table if new"""
+    name = name.strip()
+    if not name:
+        raise ValueError("User name cannot be empty.")
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, "INSERT INTO users (name) VALUES (%s) ON CONFLICT (name) DO NOTHING",
+                 (name,))
+        _execute(cur, "SELECT id FROM users WHERE name = %s", (name,))
+        owner_id = cur.fetchone()[0]
+        conn.commit()
+    return owner_id
+
+
+def set_current_user(name):
+    """Read and write the named user's tasks from now on; returns their id.
+
+    The user is created if new.  Cached records and statistics of the
+    previous user are dropped.
+    """
+    global _current_user
+    owner_id = get_or_create_user(name)
+    with _user_lock:
+        _current_user = (name.strip(), owner_id)
+    _task_cache.clear()
+    invalidate_statistics()
+    return owner_id
+
+
+def _owner():
+    """Id of the current user, looking up CURRENT_USER on first use"""
+    user = _current_user
+    if user is None:
+        with _user_lock:
+            user = _current_user
+        if user is None:
+            set_current_user(CURRENT_USER)
+            user = _current_user
+    return user[1]
+
+
+def current_user():
+    """Name of the user whose tasks are read and written"""
+    _owner()
+    return _current_user[0]
+
+
+def get_users():
+    """Names of all users, alphabetically"""
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, "SELECT name FROM users ORDER BY name")
+        return [row[0] for row in cur.fetchall()]
+
+
+def parse_deadline(deadline):
+    """Parse a deadline string in any of DEADLINE_FORMATS"""
+    for fmt in DEADLINE_FORMATS:
+        try:
+            return datetime.strptime(deadline, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid deadline: {deadline!r}")
+
+
+def parse_duration(duration):
+    """Parse a duration in minutes; empty values mean no duration (None)"""
+    if duration is None or str(duration).strip() == "":
+        return None
+    try:
+        minutes = int(str(duration).strip())
+    except ValueError:
+        raise ValueError(f"Invalid duration: {duration!r}") from None
+    if minutes <= 0:
+        raise ValueError(f"Invalid duration: {duration!r}")
+    return minutes
+
+
+def validate_task(title, description, priority, deadline, deadline_required=True,
+                  duration=None):
     if not title.strip():
         return False, "Title cannot be empty."
     if priority not in ["Low", "Medium", "High"]:
         return False, "Priority must be Low, Medium, or High."
     try:
-        datetime.strptime(deadline, "%Y-%m-%d")
+        parse_duration(duration)
     except ValueError:
-        return False, "Deadline must be in YYYY-MM-DD format."
+        return False, "Duration must be a whole number of minutes greater than 0."
+    if not deadline and not deadline_required:
+        return True, "Valid input."
+    try:
+        parse_deadline(deadline)
+    except (TypeError, ValueError):
+        return False, "Deadline must be in YYYY-MM-DD or YYYY-MM-DD HH:MM format."
     return True, "Valid input."
 
 
-def add_task(title, description, priority, deadline):
-    is_valid, message = validate_task(title, description, priority, deadline)
-    if not is_valid:
-        return False, message
-
-    # Duration will be calculated by the database
-
-    conn = get_connection()
-    cur = conn.cursor()
+def add_task(title, description, priority, deadline, duration=None):
     try:
-        cur.execute("""
-            INSERT INTO tasks (title, description, priority, deadline)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id
-        """, (title, description, priority, deadline))
-        conn.commit()
+        insert_task_row(title, description, priority, deadline, duration)
         return True, "Task added successfully."
-    except psycopg2.Error as e:
+    except ValueError as e:
+        return False, str(e)
+    except DB_ERRORS as e:
         return False, f"Database error: {e}"
-    finally:
-        cur.close()
-        conn.close()
+
+
+def insert_task_row(title, description, priority, deadline, duration=None):
+    """Insert a task and return its list row.
+
+    Raises ValueError for invalid input and DB_ERRORS on database errors.
+    """
+    is_valid, message = validate_task(title, description, priority, deadline,
+                                      duration=duration)
+    if not is_valid:
+        raise ValueError(message)
+
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, f"""
+            INSERT INTO tasks (owner_id, title, description, priority, deadline, duration)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING {TASK_ROW_COLUMNS}
+        """, (_owner(), title, description, priority, parse_deadline(deadline),
+              parse_duration(duration)))
+        row = _task_row(cur)
+        conn.commit()
+    _task_cache.put(TaskRecord.from_row(row, description))
+    invalidate_statistics()
+    return row
 
 
 def delete_task(task_id):
-    conn = get_connection()
     try:
-        with conn.cursor() as cur:
-            # Delete the task
-            cur.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
-            # Reassign IDs
-            cur.execute("""
-                UPDATE tasks SET id = new_id
-                FROM (
-                    SELECT id, ROW_NUMBER() OVER (ORDER BY id) as new_id 
-                    FROM tasks
-                ) as renumbered
-                WHERE tasks.id = renumbered.id
-            """)
-            # Reset sequence
-            cur.execute("ALTER SEQUENCE tasks_id_seq RESTART WITH 1")
-            cur.execute(
-                "SELECT setval('tasks_id_seq', (SELECT MAX(id) FROM tasks))")
-            conn.commit()
-        return True, "Task deleted and IDs reordered"
-    except Exception as e:
-        return False, str(e)
+        if delete_tasks([task_id]):
+            return True, "Task deleted"
+        return False, "Task not found"
+    except DB_ERRORS as e:
+        return False, f"Database error: {e}"
 
 
-def get_all_tasks():
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            SELECT id, title, description, priority, deadline, completed,
-                   CASE WHEN deadline IS NOT NULL 
-                        THEN deadline - CURRENT_DATE 
-                        ELSE NULL END as duration
-            FROM tasks 
-            ORDER BY created_at
-        """)
-        return cur.fetchall()
-    except psycopg2.Error as e:
+def delete_tasks(task_ids):
+    """Delete many tasks in one statement; returns the ids actually deleted.
+
+    Ids are stable: remaining tasks are never renumbered, so a delete only
+    touches the deleted rows and their index entries; number rows by their
+    position in the list for 1..n numbering.
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+    storage = get_storage()
+    with storage.connection() as conn, conn.cursor() as cur:
+        _execute(cur, f"DELETE FROM tasks WHERE owner_id = %s AND {storage.in_ids('id')} "
+                      "RETURNING id",
+                 (_owner(), storage.ids_param(task_ids)))
+        deleted = [row[0] for row in cur.fetchall()]
+        conn.commit()
+    _task_cache.discard(task_ids)
+    invalidate_statistics()
+    return deleted
+
+
+def _run_search(cur, columns, keyword, limit, table="tasks"):
+    """Relevance-ranked search returning the given columns, see the backend's search()"""
+    keyword = keyword.strip()
+    if not keyword:
         return []
-    finally:
-        cur.close()
-        conn.close()
+    return get_storage().search(cur, columns, keyword, limit, _owner(), table)
 
 
-def search_tasks(keyword):
-    conn = get_connection()
-    cur = conn.cursor()
+def search_task_rows(keyword, limit=SEARCH_LIMIT):
+    """Search returning list rows shaped like get_task_page's"""
     try:
-        search_term = f"%{keyword}%"
-        cur.execute("""
-            SELECT id, title, description, priority, deadline, 
-                   CASE WHEN deadline IS NOT NULL 
-                        THEN deadline - CURRENT_DATE 
-                        ELSE NULL END as duration
-            FROM tasks
-            WHERE title ILIKE %s OR description ILIKE %s
-            ORDER BY deadline
-        """, (search_term, search_term))
-        return cur.fetchall()
-    except psycopg2.Error:
+        with connection() as conn, conn.cursor() as cur:
+            return [TaskRow(*row) for row in
+                    _run_search(cur, TASK_ROW_COLUMNS, keyword, limit)]
+    except DB_ERRORS:
         return []
-    finally:
-        cur.close()
-        conn.close()
 
 
-def update_task(task_id, title, description, priority, deadline):
-    is_valid, message = validate_task(title, description, priority, deadline)
-    if not is_valid:
-        return False, message
+class SearchRequest:
+    """A search_task_rows call that another thread can cancel mid-query.
+
+    run() blocks and returns the rows, or None if the search was cancelled
+    (before starting, by cancel() interrupting the server-side query, or by
+    hitting the statement timeout).  cancel() is safe to call at any time.
+    """
+
+    def __init__(self, keyword, limit=SEARCH_LIMIT):
+        self.keyword = keyword
+        self.limit = limit
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
 
-    # Duration will be calculated by the database
+    def run(self):
+        storage = get_storage()
+        try:
+            with storage.connection() as conn:
+                with self._lock:
+                    if self.cancelled:
+                        return None
+                    self._conn = conn
+                try:
+                    with conn.cursor() as cur:
+                        rows = _run_search(cur, TASK_ROW_COLUMNS, self.keyword, self.limit)
+                        return [TaskRow(*row) for row in rows]
+                finally:
+                    with self._lock:
+                        self._conn = None
+        except storage.query_canceled:
+            return None
+        except DB_ERRORS:
+            return None if self.cancelled else []
 
-    conn = get_connection()
-    cur = conn.cursor()
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.cancel()
+
+
+def update_task(task_id, title, description, priority, deadline, duration=None):
     try:
-        cur.execute("""
-            UPDATE tasks 
-            SET title = %s, description = %s, priority = %s, deadline = %s
-            WHERE id = %s
-        """, (title, description, priority, deadline, task_id))
-        conn.commit()
+        update_task_row(task_id, title, description, priority, deadline, duration)
         return True, "Task updated successfully"
-    except psycopg2.Error as e:
+    except ValueError as e:
+        return False, str(e)
+    except DB_ERRORS as e:
         return False, f"Database error: {e}"
-    finally:
-        cur.close()
-        conn.close()
+
+
+def update_task_row(task_id, title, description, priority, deadline, duration=None):
+    """Update a task and return its list row, or None if it no longer exists.
+
+    A duration of None keeps the task's current duration.
+    Raises ValueError for invalid input and DB_ERRORS on database errors.
+    """
+    is_valid, message = validate_task(title, description, priority, deadline,
+                                      duration=duration)
+    if not is_valid:
+        raise ValueError(message)
+
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, f"""
+            UPDATE tasks 
+            SET title = %s, description = %s, priority = %s, deadline = %s,
+                duration = COALESCE(%s, duration)
+            WHERE owner_id = %s AND id = %s
+            RETURNING {TASK_ROW_COLUMNS}
+        """, (title, description, priority, parse_deadline(deadline),
+              parse_duration(duration), _owner(), task_id))
+        row = _task_row(cur)
+        conn.commit()
+    if row:
+        _task_cache.put(TaskRecord.from_row(row, description))
+    else:
+        _task_cache.discard([task_id])
+    invalidate_statistics()
+    return row
+
+
+def set_task_completed(task_id, completed):
+    """Mark a task completed or pending and return its list row, or None"""
+    rows = set_tasks_completed([task_id], completed)
+    return rows[0] if rows else None
+
+
+def _completed_assignment(completed):
+    """SET clause and parameters marking tasks completed or pending.
+
+    Tasks that were already completed keep their completion time.
+    """
+    if completed:
+        return ("completed = TRUE, completed_at = "
+                "CASE WHEN completed THEN completed_at ELSE %s END", (datetime.now(),))
+    return "completed = FALSE, completed_at = NULL", ()
+
+
+def _priority_assignment(priority):
+    if priority not in ["Low", "Medium", "High"]:
+        raise ValueError("Priority must be Low, Medium, or High.")
+    return "priority = %s", (priority,)
+
+
+def set_tasks_completed(task_ids, completed):
+    """Mark many tasks completed or pending in one statement; returns their list rows.
+
+    Tasks that were already completed keep their completion time.
+    """
+    return _update_tasks(task_ids, *_completed_assignment(completed))
+
+
+def set_tasks_priority(task_ids, priority):
+    """Set the priority of many tasks in one statement; returns their list rows"""
+    return _update_tasks(task_ids, *_priority_assignment(priority))
+
+
+def patch_task_record(task_id, completed=None, priority=None):
+    """Set a task's completion and/or priority in one statement.
+
+    Fields left as None are not changed.  Returns the task's TaskRecord,
+    or None if it does not exist; both changes are made or neither is.
+    """
+    assignments = []
+    params = ()
+    if priority is not None:
+        assignment, values = _priority_assignment(priority)
+        assignments.append(assignment)
+        params += values
+    if completed is not None:
+        assignment, values = _completed_assignment(completed)
+        assignments.append(assignment)
+        params += values
+    if not assignments:
+        raise ValueError("Nothing to change.")
+
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, f"""
+            UPDATE tasks SET {", ".join(assignments)}
+            WHERE owner_id = %s AND id = %s
+            RETURNING {TASK_RECORD_COLUMNS}
+        """, params + (_owner(), task_id))
+        row = cur.fetchone()
+        conn.commit()
+    if row is None:
+        _task_cache.discard([task_id])
+        return None
+    record = TaskRecord(*row)
+    _task_cache.put(record)
+    invalidate_statistics()
+    return record
+
+
+def _update_tasks(task_ids, assignments, params):
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+    storage = get_storage()
+    with storage.connection() as conn, conn.cursor() as cur:
+        _execute(cur, f"""
+            UPDATE tasks SET {assignments}
+            WHERE owner_id = %s AND {storage.in_ids('id')}
+            RETURNING {TASK_ROW_COLUMNS}
+        """, params + (_owner(), storage.ids_param(task_ids)))
+        rows = _task_rows(cur)
+        conn.commit()
+    _cache_rows(rows)
+    invalidate_statistics()
+    return rows
+
+
+def delete_task_row(task_id):
+    """Delete a task; returns whether it existed"""
+    return bool(delete_tasks([task_id]))
+
+
+def get_task_rows(sort="id", descending=False, pending=False):
+    """All tasks (only pending ones if pending is set) as list rows in the
+    given TASK_SORTS order; archived tasks are not included"""
+    storage = get_storage()
+    query = f"SELECT {TASK_ROW_COLUMNS} FROM tasks WHERE owner_id = %s"
+    if pending:
+        query += " AND NOT completed"
+    query += f" ORDER BY {_order_by(storage, sort, descending)}"
+    with storage.connection() as conn, conn.cursor() as cur:
+        _execute(cur, query, (_owner(),))
+        return _task_rows(cur)
+
+
+def _sort_fields(sort):
+    try:
+        return TASK_SORTS[sort]
+    except KeyError:
+        raise ValueError(f"Unknown sort order: {sort}") from None
+
+
+def _sort_expression(storage, field):
+    expression = SORT_FIELDS[field]
+    return getattr(storage, expression, expression)
+
+
+def _order_by(storage, sort, descending):
+    direction = " DESC" if descending else ""
+    return ", ".join(_sort_expression(storage, field) + direction
+                     for field in _sort_fields(sort))
+
+
+def _sort_value(task, field, undated):
+    """Value of a list row for one sort field, as the SQL expression sees it;
+    tasks without a deadline get undated"""
+    if field == "id":
+        return task.id
+    if field == "title":
+        return task.title.lower()
+    if field == "priority":
+        return PRIORITY_RANKS.get(task.priority, 3)
+    if field == "deadline":
+        return task.deadline if task.deadline is not None else undated
+    if field == "level":
+        return task.dependency_level
+    return task.completed
+
+
+class _Descending:
+    """Sort key wrapper that reverses the order of the wrapped key"""
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def task_sort_key(task, sort="deadline", descending=False):
+    """Python sort key of a list row matching the SQL order of sort.
+
+    Used to place changed rows in an already sorted view without asking
+    the database again.
+    """
+    key = tuple(_sort_value(task, field, datetime.max) for field in _sort_fields(sort))
+    return _Descending(key) if descending else key
 
 
 def get_task_details(task_id):
-    conn = get_connection()
-    cur = conn.cursor()
+    """The TaskRecord of a task, or None.
+
+    Served from the task cache only while the change listener keeps it in
+    step with other clients; otherwise (SQLite, or before
+    start_task_listener) another process may have edited the task, so it
+    is always read from the database.
+    """
+    if _task_listener is None:
+        try:
+            records = get_task_records([task_id])
+        except DB_ERRORS:
+            return None
+        return records[0] if records else None
+    record = _task_cache.get(task_id)
+    if record is None:
+        try:
+            records = get_task_records([task_id])
+        except DB_ERRORS:
+            return None
+        if not records:
+            return None
+        record = records[0]
+        _task_cache.put(record)
+    return record
+
+
+def get_task_records(task_ids):
+    """TaskRecords of the given tasks that still exist and belong to the current user"""
+    storage = get_storage()
+    with storage.connection() as conn, conn.cursor() as cur:
+        _execute(cur, f"SELECT {TASK_RECORD_COLUMNS} FROM tasks "
+                      f"WHERE owner_id = %s AND {storage.in_ids('id')}",
+                 (_owner(), storage.ids_param(task_ids)))
+        return [TaskRecord(*row) for row in cur.fetchall()]
+
+
+def _cache_rows(rows):
+    """Write changed list rows through to cached records, keeping descriptions"""
+    for row in rows:
+        record = _task_cache.peek(row.id)
+        if record is not None:
+            _task_cache.put(TaskRecord.from_row(row, record.description))
+
+
+def start_task_listener():
+    """Start applying other clients' task changes to the cache (idempotent).
+
+    Returns None when the storage backend has no change notifications.
+    """
+    global _task_listener
+    storage = get_storage()
+    if _task_listener is None and storage.supports_notifications:
+        _task_listener = TaskChangeListener(_task_cache, get_task_records,
+                                            on_change=invalidate_statistics,
+                                            owner=_owner,
+                                            connect=storage.listen_connection,
+                                            own_pids=storage.backend_pids)
+        _task_listener.start()
+    return _task_listener
+
+
+def stop_task_listener():
+    global _task_listener
+    if _task_listener is not None:
+        _task_listener.stop()
+        _task_listener = None
+
+
+def get_task_changes():
+    """Task changes made by other clients since the last call.
+
+    Returns a list of (rows, removed_ids) batches of list rows, oldest
+    first.  A None batch means too much changed to list and views should
+    reload.  Empty until start_task_listener() has been called.
+    """
+    if _task_listener is None:
+        return []
+    return [None if batch is None
+            else ([record.task_row() for record in batch[0]], batch[1])
+            for batch in _task_listener.changes()]
+
+
+def task_cache_stats():
+    return _task_cache.stats()
+
+
+def get_task_page(after=None, before=None, limit=PAGE_SIZE, sort="deadline",
+                  descending=False, pending=False):
+    """Fetch one page of tasks in a TASK_SORTS order with keyset pagination.
+
+    after is the last row already shown and returns the rows following it;
+    before is the first row shown and returns the rows preceding it.  With
+    neither, the first page is returned.  Every order is backed by an index,
+    so each page is a range scan; with pending set only pending tasks are
+    paged, in deadline order from a partial index of them.  Rows are always
+    returned in display order as TASK_ROW_COLUMNS rows.
+    """
+    fields = _sort_fields(sort)
+    storage = get_storage()
+    # Walking backward reverses the order; the result is flipped afterwards
+    backwards = before is not None
+    anchor = before if backwards else after
+    query = f"SELECT {TASK_ROW_COLUMNS} FROM tasks WHERE owner_id = %s"
+    params = (_owner(),)
+    if pending:
+        query += " AND NOT completed"
+    if anchor is not None:
+        expressions = [_sort_expression(storage, field) for field in fields]
+        values = tuple(_sort_value(anchor, field, storage.undated_sort_value)
+                       for field in fields)
+        op = "<" if backwards != descending else ">"
+        placeholders = ", ".join(["%s"] * len(fields))
+        # The bound on the leading key alone is redundant, but SQLite only
+        # range-scans the index with it; otherwise deep pages rescan every
+        # row before the anchor
+        query += (f" AND {expressions[0]} {op}= %s"
+                  f" AND ({', '.join(expressions)}) {op} ({placeholders})")
+        params += values[:1] + values
+    query += f" ORDER BY {_order_by(storage, sort, backwards != descending)} LIMIT %s"
+
+    with storage.connection() as conn, conn.cursor() as cur:
+        _execute(cur, query, params + (limit,))
+        rows = _task_rows(cur)
+    if backwards:
+        rows.reverse()
+    return rows
+
+
+def get_task_statistics():
+    """Return total/pending/completed/overdue counts as a dict, or None on error.
+
+    Counts cover the current user's tasks, not counting archived ones.  Overdue tasks are counted from
+    the partial index on pending deadlines; on PostgreSQL totals come from
+    the user's trigger-maintained task_counters row.  The result is cached
+    until a mutation invalidates it or it expires.
+    """
+    owner_id = _owner()
+    with _stats_lock:
+        cached = _stats_cache["values"].get(owner_id)
+        if cached is not None and time.monotonic() < cached[1]:
+            return dict(cached[0])
+        version = _stats_cache["version"]
+
+    storage = get_storage()
     try:
-        cur.execute("""
-            SELECT id, title, description, priority, deadline, 
-                   CASE WHEN deadline IS NOT NULL 
-                        THEN deadline - CURRENT_DATE 
-                        ELSE NULL END as duration
-            FROM tasks WHERE id = %s
-        """, (task_id,))
-        task = cur.fetchone()
-        return task if task else None
-    except psycopg2.Error:
+        with storage.connection() as conn, conn.cursor() as cur:
+            row = storage.count_tasks(cur, owner_id)
+    except DB_ERRORS:
+        return None
+    if row is None:
         return None
-    finally:
-        cur.close()
-        conn.close()
+
+    total, completed, overdue = row
+    stats = {
+        "total": total,
+        "pending": total - completed,
+        "completed": completed,
+        "overdue": overdue,
+    }
+    with _stats_lock:
+        # Don't cache counts read while a concurrent mutation invalidated them
+        if _stats_cache["version"] == version:
+            _stats_cache["values"][owner_id] = (stats, time.monotonic() + STATS_CACHE_TTL)
+    return dict(stats)
+
+
+def invalidate_statistics():
+    """Drop the cached statistics; called by every path that changes tasks"""
+    with _stats_lock:
+        _stats_cache["values"].clear()
+        _stats_cache["version"] += 1
+
+
+def task_score(priority, deadline, duration):
+    """Scheduling key for a pending task; smaller means do it sooner.
+
+    The key is the latest time the task should be started: its deadline,
+    less its duration and the lead time for its priority.  It does not
+    depend on the current time, so queued tasks never need re-scoring as
+    the clock moves.  Tasks without a deadline come after all others,
+    highest priority first.
+    """
+    lead = PRIORITY_LEAD.get(priority, timedelta(0))
+    if deadline is None:
+        return (1, -lead.total_seconds())
+    start_by = deadline - timedelta(minutes=duration or DEFAULT_DURATION) - lead
+    return (0, start_by.timestamp())
+
+
+class TaskQueue:
+    """Pending tasks in a binary heap ordered by task_score.
+
+    Tasks are TaskRows.  push() adds or re-scores a
+    task and remove() drops one in O(log n): replaced entries are only
+    marked dead and are skipped when they surface, and the heap is
+    rebuilt once more than half of it is dead.  next(k) returns the k
+    most urgent tasks in O(k log k) without modifying the heap.
+    """
+
+    def __init__(self, tasks=()):
+        self._entries = {}
+        self._heap = []
+        self._dead = 0
+        # Entries are [key, sequence, task]; the sequence number breaks ties
+        # so a dead entry is never compared on its task
+        self._sequence = itertools.count()
+        for task in tasks:
+            if not task.completed:
+                entry = [task_score(task.priority, task.deadline, task.duration),
+                         next(self._sequence), task]
+                self._entries[task.id] = entry
+                self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, task_id):
+        return task_id in self._entries
+
+    def push(self, task):
+        """Add or update a task; completed tasks are removed from the queue"""
+        if task.completed:
+            self.remove(task.id)
+            return
+        key = task_score(task.priority, task.deadline, task.duration)
+        entry = self._entries.get(task.id)
+        if entry is not None and entry[0] == key:
+            entry[2] = task
+            return
+        self.remove(task.id)
+        entry = [key, next(self._sequence), task]
+        self._entries[task.id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, task_id):
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return
+        entry[2] = None
+        self._dead += 1
+        if self._dead > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if e[2] is not None]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+    def pop(self):
+        """Remove and return the most urgent task, or None if the queue is empty"""
+        while self._heap:
+            task = heapq.heappop(self._heap)[2]
+            if task is not None:
+                del self._entries[task.id]
+                return task
+            self._dead -= 1
+        return None
+
+    def next(self, k=NEXT_UP_COUNT):
+        """The k most urgent tasks, most urgent first"""
+        heap = self._heap
+        result = []
+        # Walk the heap best-first, expanding only the children of visited nodes
+        frontier = [(heap[0][0], heap[0][1], 0)] if heap else []
+        while frontier and len(result) < k:
+            _, _, index = heapq.heappop(frontier)
+            if heap[index][2] is not None:
+                result.append(heap[index][2])
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child][0], heap[child][1], child))
+        return result
+
+
+def _pending_tasks():
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, f"SELECT {TASK_ROW_COLUMNS} FROM tasks "
+                      "WHERE owner_id = %s AND NOT completed", (_owner(),))
+        return _task_rows(cur)
+
+
+def get_upcoming_deadlines(after=None):
+    """Pending tasks due after the given time (default now), as list rows"""
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, f"SELECT {TASK_ROW_COLUMNS} FROM tasks "
+                      "WHERE owner_id = %s AND NOT completed AND deadline > %s",
+                 (_owner(), after or datetime.now()))
+        return _task_rows(cur)
+
+
+def get_task_queue():
+    """Build a TaskQueue of all pending tasks"""
+    return TaskQueue(_pending_tasks())
+
+
+def _merge_intervals(intervals):
+    """Sort (start, end) intervals and merge the ones that overlap or touch"""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _free_intervals(start, busy, day_start, day_end, work_days):
+    """Yield the free working (start, end) intervals from start on, in order.
+
+    busy must be sorted and non-overlapping, as returned by
+    _merge_intervals.  The walk only moves forward, so producing every
+    interval costs O(days + len(busy)) in total.
+    """
+    # Skip busy intervals that are over before start
+    index = bisect.bisect_right([end for _, end in busy], start)
+    day = datetime.combine(start.date(), datetime.min.time())
+    while True:
+        if day.weekday() in work_days:
+            cursor = max(day + day_start, start)
+            window_end = day + day_end
+            while cursor < window_end:
+                while index < len(busy) and busy[index][1] <= cursor:
+                    index += 1
+                if index == len(busy) or busy[index][0] >= window_end:
+                    yield cursor, window_end
+                    break
+                if busy[index][0] > cursor:
+                    yield cursor, busy[index][0]
+                cursor = busy[index][1]
+        day += timedelta(days=1)
+
+
+def _deadline_order(task):
+    """Earliest deadline first; undated tasks last, then by priority and id"""
+    return (task.deadline is None, task.deadline or datetime.min,
+            PRIORITY_RANKS.get(task.priority, 3), task.id)
+
+
+def schedule_tasks(tasks, start=None, busy=(), day_start=WORK_DAY_START,
+                   day_end=WORK_DAY_END, work_days=WORK_DAYS):
+    """Pack pending tasks into working hours, earliest deadline first.
+
+    tasks are TaskRows; completed ones are skipped.
+    Each task needs its duration (DEFAULT_DURATION minutes if unset) of
+    working time between day_start and day_end on work_days, outside the
+    busy (start, end) intervals, and is split over several free slots when
+    one is too short.  Working on tasks one at a time in deadline order
+    meets every deadline whenever any order can.  Undated tasks come last.
+
+    Returns (timeline, late): timeline lists (task, start, end) slots in
+    time order, and late lists (task, finish) for the tasks that finish
+    after their deadline.
+    """
+    work_days = set(work_days)
+    if day_end <= day_start or not work_days & set(range(7)):
+        raise ValueError("Working hours must include some time on some weekday.")
+    start = start or datetime.now()
+    free = _free_intervals(start, _merge_intervals(busy), day_start, day_end,
+                           work_days)
+    timeline = []
+    late = []
+    slot_start = slot_end = start
+    for task in sorted((task for task in tasks if not task.completed), key=_deadline_order):
+        remaining = timedelta(minutes=task.duration or DEFAULT_DURATION)
+        while remaining:
+            if slot_start >= slot_end:
+                slot_start, slot_end = next(free)
+            end = min(slot_end, slot_start + remaining)
+            timeline.append((task, slot_start, end))
+            remaining -= end - slot_start
+            slot_start = end
+        if task.deadline is not None and slot_start > task.deadline:
+            late.append((task, slot_start))
+    return timeline, late
+
+
+def get_task_plan(start=None, busy=(), **working_hours):
+    """Schedule all pending tasks with schedule_tasks"""
+    return schedule_tasks(_pending_tasks(), start, busy, **working_hours)
+
+
+def add_dependency(task_id, depends_on):
+    """Make task_id depend on depends_on finishing first.
+
+    Keeps dependency_level a topological order incrementally: only the
+    tasks whose level must rise are visited, and the cycle check only
+    searches tasks whose level lies between the two ends of the new edge.
+    Returns the list rows whose level changed.  Raises ValueError if a task
+    is missing or the edge would create a cycle.
+    """
+    if task_id == depends_on:
+        raise ValueError("A task cannot depend on itself.")
+    storage = get_storage()
+    owner_id = _owner()
+    with storage.connection() as conn, conn.cursor() as cur:
+        # One edge at a time per user, so concurrent edges cannot close a cycle
+        storage.lock_dependencies(cur, owner_id)
+        _execute(cur, "SELECT id, dependency_level FROM tasks "
+                      "WHERE owner_id = %s AND id IN (%s, %s)",
+                 (owner_id, task_id, depends_on))
+        levels = dict(cur.fetchall())
+        if len(levels) < 2:
+            raise ValueError("Task not found.")
+
+        if levels[depends_on] >= levels[task_id]:
+            # Every path climbs in level, so a path from task_id back to
+            # depends_on only passes tasks at or below depends_on's level
+            # Prepared statements need the anchor's type spelled out
+            _execute(cur, """
+                WITH RECURSIVE reachable(id) AS (
+                    SELECT CAST(%s AS INTEGER)
+                    UNION
+                    SELECT d.task_id FROM reachable r
+                    JOIN task_dependencies d
+                      ON d.owner_id = %s AND d.depends_on = r.id
+                    JOIN tasks t ON t.owner_id = %s AND t.id = d.task_id
+                    WHERE t.dependency_level <= %s
+                )
+                SELECT EXISTS (SELECT 1 FROM reachable WHERE id = %s)
+            """, (task_id, owner_id, owner_id, levels[depends_on], depends_on))
+            if cur.fetchone()[0]:
+                raise ValueError("That dependency would create a cycle.")
+
+        _execute(cur, """
+            INSERT INTO task_dependencies (owner_id, task_id, depends_on)
+            VALUES (%s, %s, %s)
+            ON CONFLICT DO NOTHING
+        """, (owner_id, task_id, depends_on))
+
+        rows = []
+        if levels[depends_on] >= levels[task_id]:
+            # Raise task_id above its new prerequisite and push its
+            # dependents up only as far as they need to go
+            _execute(cur, f"""
+                WITH RECURSIVE raised(task_id, new_level) AS (
+                    SELECT CAST(%s AS INTEGER), CAST(%s AS INTEGER)
+                    UNION
+                    SELECT d.task_id, r.new_level + 1 FROM raised r
+                    JOIN task_dependencies d
+                      ON d.owner_id = %s AND d.depends_on = r.task_id
+                    JOIN tasks t ON t.owner_id = %s AND t.id = d.task_id
+                    WHERE t.dependency_level < r.new_level + 1
+                )
+                UPDATE tasks SET dependency_level = m.new_level
+                FROM (SELECT task_id, MAX(new_level) AS new_level
+                      FROM raised GROUP BY task_id) m
+                WHERE tasks.owner_id = %s AND tasks.id = m.task_id
+                RETURNING {TASK_ROW_COLUMNS}
+            """, (task_id, levels[depends_on] + 1, owner_id, owner_id, owner_id))
+            rows = _task_rows(cur)
+        conn.commit()
+    _cache_rows(rows)
+    return rows
+
+
+def remove_dependency(task_id, depends_on):
+    """Remove a prerequisite; returns whether it existed.
+
+    Levels are left as they are: removing an edge cannot break the
+    topological order, it may only leave some tasks higher than needed.
+    """
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, "DELETE FROM task_dependencies "
+                      "WHERE owner_id = %s AND task_id = %s AND depends_on = %s",
+                 (_owner(), task_id, depends_on))
+        removed = cur.rowcount > 0
+        conn.commit()
+    return removed
+
+
+def get_prerequisites(task_id):
+    """List rows of the tasks task_id directly depends on"""
+    with connection() as conn, conn.cursor() as cur:
+        owner_id = _owner()
+        _execute(cur, f"""
+            SELECT {TASK_ROW_COLUMNS} FROM tasks
+            WHERE owner_id = %s
+              AND id IN (SELECT depends_on FROM task_dependencies
+                         WHERE owner_id = %s AND task_id = %s)
+            ORDER BY dependency_level, id
+        """, (owner_id, owner_id, task_id))
+        return _task_rows(cur)
+
+
+def get_critical_path(task_id):
+    """Longest chain of unfinished work that has to happen before task_id is done.
+
+    Only task_id and its transitive prerequisites are read, visited in
+    level order so each is handled once.  Completed tasks count as no
+    work and unset durations as DEFAULT_DURATION.  Returns (path, minutes)
+    where path lists TaskRows from the first task to do up to task_id.
+    """
+    with connection() as conn, conn.cursor() as cur:
+        owner_id = _owner()
+        _execute(cur, f"""
+            WITH RECURSIVE ancestors(task_id) AS (
+                SELECT CAST(%s AS INTEGER)
+                UNION
+                SELECT d.depends_on FROM ancestors a
+                JOIN task_dependencies d
+                  ON d.owner_id = %s AND d.task_id = a.task_id
+            )
+            SELECT {TASK_ROW_COLUMNS}, d.depends_on
+            FROM ancestors
+            JOIN tasks ON tasks.owner_id = %s AND tasks.id = ancestors.task_id
+            LEFT JOIN task_dependencies d
+              ON d.owner_id = %s AND d.task_id = tasks.id
+            ORDER BY dependency_level, tasks.id
+        """, (task_id, owner_id, owner_id, owner_id))
+        rows = cur.fetchall()
+    if not rows:
+        return [], 0
+
+    # One row per prerequisite edge (or one with None); each task's rows are
+    # adjacent and come after those of all its prerequisites
+    tasks = {}
+    finish = {}
+    previous = {}
+    for key, edges in itertools.groupby(rows, key=lambda row: row[0]):
+        edges = list(edges)
+        task = TaskRow(*edges[0][:-1])
+        prerequisites = [edge[-1] for edge in edges if edge[-1] is not None]
+        minutes = 0 if task.completed else task.duration or DEFAULT_DURATION
+        before = max(prerequisites, key=finish.__getitem__, default=None)
+        tasks[key] = task
+        previous[key] = before
+        finish[key] = minutes + (finish[before] if before is not None else 0)
+
+    path = []
+    current = task_id
+    while current is not None:
+        path.append(tasks[current])
+        current = previous[current]
+    path.reverse()
+    return path, finish[task_id]
+
+
+def _task_file_format(path, fmt):
+    if fmt:
+        fmt = fmt.lower()
+    elif isinstance(path, str):
+        fmt = os.path.splitext(path)[1].lower().lstrip(".")
+    if fmt in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if fmt == "csv":
+        return "csv"
+    raise ValueError("Format must be csv or jsonl.")
+
+
+def _parse_completed(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in ("", "0", "f", "false", "n", "no"):
+        return False
+    if text in ("1", "t", "true", "y", "yes"):
+        return True
+    raise ValueError(f"Completed must be true or false, got {value!r}.")
+
+
+def _import_row(record):
+    """Validate one imported record and return the tuple to COPY"""
+    if not isinstance(record, dict):
+        raise ValueError("Each record must be an object with task fields.")
+    title = str(record.get("title") or "")
+    description = record.get("description")
+    priority = record.get("priority") or "Medium"
+    deadline = record.get("deadline") or None
+    duration = record.get("duration")
+    is_valid, message = validate_task(title, description, priority, deadline,
+                                      deadline_required=False, duration=duration)
+    if not is_valid:
+        raise ValueError(message)
+    if deadline is not None:
+        deadline = parse_deadline(str(deadline)).isoformat(sep=" ")
+    completed = _parse_completed(record.get("completed"))
+    return (title, description, priority, deadline, parse_duration(duration), completed)
+
+
+def _read_task_records(source, fmt):
+    """Yield (line_number, record) pairs; unparsable lines yield the error as record"""
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e}")
+
+
+def _copy_batch(rows):
+    """Bulk-insert one batch of validated rows into tasks in its own transaction.
+
+    Completed rows count as completed at the time of the import.
+    """
+    storage = get_storage()
+    owner_id = _owner()
+    now = datetime.now()
+    with storage.connection() as conn, conn.cursor() as cur:
+        storage.copy_tasks_in(cur, ("owner_id", "title", "description", "priority",
+                                    "deadline", "duration", "completed", "completed_at"),
+                              ((owner_id,) + row + (now if row[-1] else None,)
+                               for row in rows))
+        conn.commit()
+
+
+def import_tasks(source, fmt=None, batch_size=IMPORT_BATCH_SIZE):
+    """Bulk-load tasks from a CSV or JSON Lines file into the current user's tasks.
+
+    source is a path or an open text file; fmt ("csv" or "jsonl") defaults
+    to the file extension.  CSV files need a header row naming the columns
+    (title, description, priority, deadline, duration, completed); other
+    columns such as id are ignored.  Every record is checked with validate_task and
+    invalid ones are skipped and reported instead of aborting the load.
+    Valid rows are copied in batches of batch_size, each committed on its
+    own (with COPY FROM STDIN on PostgreSQL).  Returns (imported_count,
+    errors) where errors is a list of (line_number, message).
+    """
+    fmt = _task_file_format(source, fmt)
+    if isinstance(source, str):
+        with open(source, newline="", encoding="utf-8") as f:
+            return import_tasks(f, fmt, batch_size)
+
+    imported = 0
+    errors = []
+    batch = []
+    batch_start = None
+
+    def flush():
+        nonlocal imported, batch, batch_start
+        if not batch:
+            return
+        try:
+            _copy_batch(batch)
+            imported += len(batch)
+        except DB_ERRORS as e:
+            errors.append((batch_start,
+                           f"Batch of {len(batch)} rows starting here failed: {e}"))
+        batch = []
+        batch_start = None
+
+    for line_number, record in _read_task_records(source, fmt):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            row = _import_row(record)
+        except ValueError as e:
+            errors.append((line_number, str(e)))
+            continue
+        if batch_start is None:
+            batch_start = line_number
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if imported:
+        invalidate_statistics()
+    return imported, errors
+
+
+def export_tasks(destination, fmt=None, archived=False):
+    """Stream every task of the current user to a CSV or JSON Lines file.
+
+    destination is a path or an open text file; fmt defaults to the file
+    extension; PostgreSQL writes it with COPY TO STDOUT.  With archived set
+    the archived tasks are written instead.  The output can be loaded back
+    with import_tasks.  Returns the number of tasks written.
+    """
+    fmt = _task_file_format(destination, fmt)
+    if isinstance(destination, str):
+        with open(destination, "w", newline="", encoding="utf-8") as f:
+            return export_tasks(f, fmt, archived)
+
+    storage = get_storage()
+    table = "tasks_archive" if archived else "tasks"
+    with storage.connection() as conn, conn.cursor() as cur:
+        return storage.copy_tasks_out(cur, destination, fmt, _owner(), table)
+
+
+def archive_completed_tasks(days=ARCHIVE_AFTER_DAYS):
+    """Move the current user's tasks completed more than days ago to tasks_archive.
+
+    The tasks table, and with it every index the task list and scheduling
+    read, then only holds pending and recently completed work however much
+    history builds up.  Archived tasks drop out of the statistics and lose
+    their dependency edges; a completed prerequisite is no work anyway.
+    Returns the ids of the archived tasks.
+    """
+    if days < 0:
+        raise ValueError("Days must not be negative.")
+    storage = get_storage()
+    with storage.connection() as conn, conn.cursor() as cur:
+        archived = storage.move_tasks(cur, "tasks", "tasks_archive", ARCHIVE_COLUMNS,
+                                      "owner_id = %s AND completed AND completed_at < %s",
+                                      (_owner(), datetime.now() - timedelta(days=days)))
+        conn.commit()
+    _task_cache.discard(archived)
+    invalidate_statistics()
+    return archived
+
+
+def get_archive_page(after=None, limit=PAGE_SIZE):
+    """One page of the current user's archived tasks as list rows, newest first.
+
+    after is the id of the last row already shown.
+    """
+    query = f"SELECT {TASK_ROW_COLUMNS} FROM tasks_archive WHERE owner_id = %s"
+    params = (_owner(),)
+    if after is not None:
+        query += " AND id < %s"
+        params += (after,)
+    with connection() as conn, conn.cursor() as cur:
+        _execute(cur, query + " ORDER BY id DESC LIMIT %s", params + (limit,))
+        return _task_rows(cur)
+
+
+def search_archived_tasks(keyword, limit=SEARCH_LIMIT):
+    """search_task_rows over the current user's archived tasks"""
+    with connection() as conn, conn.cursor() as cur:
+        return [TaskRow(*row) for row in
+                _run_search(cur, TASK_ROW_COLUMNS, keyword, limit, "tasks_archive")]
+
+
+def restore_tasks(task_ids):
+    """Move archived tasks back to the task list; returns their list rows.
+
+    They stay completed but count as completed now, so automatic archiving
+    leaves them in the list for another ARCHIVE_AFTER_DAYS.  Dependency
+    edges dropped when they were archived are not restored.
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+    storage = get_storage()
+    owner_id = _owner()
+    rows = []
+    with storage.connection() as conn, conn.cursor() as cur:
+        restored = storage.move_tasks(cur, "tasks_archive", "tasks", ARCHIVE_COLUMNS,
+                                      f"owner_id = %s AND {storage.in_ids('id')}",
+                                      (owner_id, storage.ids_param(task_ids)))
+        if restored:
+            _execute(cur, f"""
+                UPDATE tasks SET completed_at = %s
+                WHERE owner_id = %s AND {storage.in_ids('id')}
+                RETURNING {TASK_ROW_COLUMNS}
+            """, (datetime.now(), owner_id, storage.ids_param(restored)))
+            rows = _task_rows(cur)
+        conn.commit()
+    invalidate_statistics()
+    return rows
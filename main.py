@@ -1,32 +1,177 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import ttkbootstrap as tb
-from db.init_db import init_db
-from db.connection import get_connection
-from datetime import datetime
+from engine import (ARCHIVE_AFTER_DAYS, PAGE_SIZE, SEARCH_LIMIT, SearchRequest,
+                    add_dependency, archive_completed_tasks, get_archive_page,
+                    restore_tasks, search_archived_tasks,
+                    close_database, delete_tasks, get_critical_path,
+                    get_task_changes, get_task_plan, get_task_queue,
+                    get_upcoming_deadlines, init_database, current_user,
+                    remove_dependency, start_task_listener,
+                    get_task_details, get_task_page, get_task_rows,
+                    get_task_statistics, insert_task_row, task_sort_key, invalidate_statistics,
+                    set_tasks_completed, set_tasks_priority, update_task_row)
+from worker import DBWorker
+from diagnostics import DIAGNOSTICS_INTERVAL_MS, MemoryDiagnostics, diagnostics_enabled
+from notifier import DeadlineNotifier, alert_message
+import queue
+from bisect import bisect, bisect_left
+from datetime import datetime, timedelta
+
+# Paged view keeps at most this many pages of rows in the Treeview
+WINDOW_PAGES = 3
+# Fetch another page when the view is within this fraction of either end
+PAGE_EDGE = 0.1
+# Live search waits this long after the last keystroke before querying
+SEARCH_DEBOUNCE_MS = 300
+# Most timeline slots listed in the Plan window
+PLAN_ROWS = 2000
+# How often changes made by other app instances are applied to the list
+CHANGE_POLL_MS = 250
+# How often deadline reminders are collected from the notifier thread
+ALERT_POLL_MS = 1000
+# Most reminders listed in the Deadline Alerts window
+ALERT_ROWS = 200
+# Days offered by "Archive Completed..." when ARCHIVE_AFTER_DAYS is not set
+DEFAULT_ARCHIVE_DAYS = 30
+
+
+# Task list order (engine.TASK_SORTS) used by each sortable column header
+COLUMN_SORTS = {
+    "ID": "id",
+    "Title": "title",
+    "Priority": "priority",
+    "Deadline": "deadline",
+    "Time Remaining": "deadline",
+    "Status": "status",
+    "Step": "dependencies",
+}
+
+
+def rows_in_place(order, position):
+    """Ids of the longest subsequence of order already in that order on screen.
+
+    position maps each id to its current index.  Found in O(n log n) by
+    patience sorting; every other row has to move.
+    """
+    tails = []       # current index ending the best run of each length
+    tail_ids = []
+    previous = {}
+    for iid in order:
+        index = position[iid]
+        length = bisect_left(tails, index)
+        previous[iid] = tail_ids[length - 1] if length else None
+        if length == len(tails):
+            tails.append(index)
+            tail_ids.append(iid)
+        else:
+            tails[length] = index
+            tail_ids[length] = iid
+    in_place = set()
+    iid = tail_ids[-1] if tail_ids else None
+    while iid is not None:
+        in_place.add(iid)
+        iid = previous[iid]
+    return in_place
+
+
+def sorted_position(rows, task, sort):
+    """Index at which task keeps rows, sorted by sort as (sort, descending), in order.
+
+    Computes O(log n) sort keys, so placing a row in a long list stays cheap.
+    """
+    key = task_sort_key(task, *sort)
+    low, high = 0, len(rows)
+    while low < high:
+        middle = (low + high) // 2
+        if key < task_sort_key(rows[middle], *sort):
+            high = middle
+        else:
+            low = middle + 1
+    return low
 
 
 class TaskSchedulerApp:
-    def __init__(self, root):
+    def __init__(self, root, page_size=PAGE_SIZE):
         self.root = root
+        self.page_size = page_size
         self.root.title("Smart Task Scheduler - Pan-Atlantic University")
         self.root.geometry("1000x700")
 
         self.style = tb.Style("flatly")
 
-        # Initialize database and test connection
-        try:
-            init_db()  # This now only creates table if it doesn't exist
-            test_conn = get_connection()
-            test_conn.close()
-            print("Database connection successful!")
-            self.db_connected = True
-        except Exception as e:
-            print(f"Database error: {e}")
-            self.db_connected = False
+        # All database calls run on this worker so the UI never blocks on them
+        self.db_connected = False
+        self.worker = DBWorker(self.root, on_busy_change=self.set_busy)
+
+        # Treeview item id -> (values, tags) currently displayed
+        self.row_views = {}
+        # Treeview item id -> row of each pending task with a deadline shown,
+        # whose countdown update_countdowns keeps current
+        self.countdown_tasks = {}
+        self.countdown_refresh_pending = False
+
+        # Column-header sort, kept across refreshes; until a header is
+        # clicked the full list is ordered by id and the paged view by deadline
+        self.sort_column = None
+        self.sort_descending = False
+
+        # The rows shown in window_sort order and whether they reach either
+        # end of the table: a window of pages in the paged view, the whole
+        # list otherwise
+        self.paged_var = tk.BooleanVar(value=False)
+        # List only pending tasks, read from the partial index on them
+        self.pending_var = tk.BooleanVar(value=False)
+        self.paging = False
+        self.page_pending = False
+        self.window_sort = ("deadline", False)
+        self.window_rows = []
+        self.window_at_start = True
+        self.window_at_end = True
+
+        # Every list load or search bumps list_generation so results that
+        # arrive after a newer request are dropped; data_version counts
+        # applied mutations so a load that raced one can be redone
+        self.list_generation = 0
+        self.data_version = 0
+
+        # Live search state: pending debounce timer, the in-flight request
+        # and the query whose results are shown (None when showing the list)
+        self.search_after_id = None
+        self.search_request = None
+        self.shown_search = None
+
+        # Pending tasks in scheduling order, kept current by on_tasks_changed
+        self.task_queue = None
+
+        # The Plan window, replaced each time a new plan is shown
+        self.plan_window = None
+
+        # Deadline reminders, kept current by on_tasks_changed; the notifier
+        # thread queues due ones for show_alerts on the Tk thread
+        self.alerts = queue.Queue()
+        self.notifier = DeadlineNotifier(lambda task, lead: self.alerts.put((task, lead)))
+        self.alert_window = None
+
+        # The Archived Tasks window, built on first use; archive_generation
+        # drops results of superseded archive loads
+        self.archive_window = None
+        self.archive_generation = 0
+        self.archive_last_id = None
 
         self.create_widgets()
-        self.load_tasks()
+        self.create_context_menu()
+
+        # Object and widget counts across operations, when diagnostics mode
+        # is on (see diagnostics.DIAGNOSTICS_ENV)
+        self.diagnostics = None
+        if diagnostics_enabled():
+            self.diagnostics = MemoryDiagnostics(self.root)
+            self.root.bind("<F12>", lambda e: self.show_diagnostics())
+            self.root.after(DIAGNOSTICS_INTERVAL_MS, self.log_diagnostics)
+
+        self.schedule_countdowns()
+        self.connect_database()
 
     def create_widgets(self):
         main_frame = ttk.Frame(self.root)
@@ -64,8 +209,14 @@ class TaskSchedulerApp:
         ttk.Button(input_frame, text="📅", command=self.show_datetime_picker,
                    width=3).grid(row=2, column=4, padx=2)
 
+        ttk.Label(input_frame, text="Duration (mins):").grid(
+            row=3, column=0, sticky="w", pady=5)
+        self.duration_entry = ttk.Spinbox(input_frame, from_=1, to=1440, width=8)
+        self.duration_entry.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+        self.duration_entry.set(60)  # Default to 60 minutes
+
         btn_frame = ttk.Frame(input_frame)
-        btn_frame.grid(row=3, column=0, columnspan=5, pady=10, sticky="ew")
+        btn_frame.grid(row=4, column=0, columnspan=5, pady=10, sticky="ew")
 
         self.add_btn = ttk.Button(
             btn_frame, text="Add Task", command=self.add_task)
@@ -83,18 +234,34 @@ class TaskSchedulerApp:
                    command=self.clear_fields).pack(side="left", padx=5)
 
         ttk.Button(btn_frame, text="Refresh",
-                   command=self.load_tasks).pack(side="left", padx=5)
+                   command=self.refresh_tasks).pack(side="left", padx=5)
+
+        ttk.Button(btn_frame, text="Next Up",
+                   command=self.show_next_tasks).pack(side="left", padx=5)
+
+        ttk.Button(btn_frame, text="Plan",
+                   command=self.show_task_plan).pack(side="left", padx=5)
 
         ttk.Button(btn_frame, text="Help",
                    command=self.show_help).pack(side="left", padx=5)
 
+        ttk.Button(btn_frame, text="Archive",
+                   command=self.show_archive).pack(side="left", padx=5)
+
+        ttk.Checkbutton(btn_frame, text="Paged View", variable=self.paged_var,
+                        command=self.load_tasks).pack(side="left", padx=5)
+        ttk.Checkbutton(btn_frame, text="Hide Completed", variable=self.pending_var,
+                        command=self.load_tasks).pack(side="left", padx=5)
+
         list_frame = ttk.LabelFrame(main_frame, text="Task List", padding=10)
         list_frame.pack(fill="both", expand=True, pady=(0, 10))
 
-        columns = ("ID", "Title", "Priority", "Deadline", "Time Remaining", "Status")
-        self.tree = ttk.Treeview(list_frame, columns=columns, show="headings")
+        columns = ("ID", "Title", "Priority", "Deadline", "Time Remaining", "Status", "Step")
+        self.tree = ttk.Treeview(list_frame, columns=columns, show="headings",
+                                 selectmode="extended")
         for col in columns:
-            self.tree.heading(col, text=col)
+            self.tree.heading(col, text=col,
+                              command=lambda c=col: self.sort_by_column(c))
             if col == "ID":
                 self.tree.column(col, width=50)
             elif col == "Title":
@@ -105,15 +272,21 @@ class TaskSchedulerApp:
                 self.tree.column(col, width=120)
             elif col == "Status":
                 self.tree.column(col, width=80)
+            elif col == "Step":
+                self.tree.column(col, width=50)
             else:
                 self.tree.column(col, width=100)
 
-        scrollbar = ttk.Scrollbar(
+        self.scrollbar = ttk.Scrollbar(
             list_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
 
         self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
+
+        # Configure tags for visual feedback
+        self.tree.tag_configure("overdue", background="#ffcccc")
+        self.tree.tag_configure("completed", background="#ccffcc")
 
         # Bind events
         self.tree.bind("<Double-1>", self.show_task_description)
@@ -137,6 +310,8 @@ class TaskSchedulerApp:
 
         # Bind Enter key to search
         search_entry.bind("<Return>", lambda e: self.search_tasks())
+        # Search as you type
+        self.search_var.trace_add("write", self.on_search_changed)
 
         # Task Statistics Frame
         stats_frame = ttk.Frame(main_frame)
@@ -155,10 +330,14 @@ class TaskSchedulerApp:
         status_label = ttk.Label(status_frame, textvariable=self.status_var)
         status_label.pack(side="left")
 
+        # Shown while database operations are running
+        self.busy_bar = ttk.Progressbar(
+            status_frame, mode="indeterminate", length=120)
+
         input_frame.columnconfigure(1, weight=1)
 
         # Keyboard shortcuts
-        self.root.bind("<F5>", lambda e: self.load_tasks())  # F5 to refresh
+        self.root.bind("<F5>", lambda e: self.refresh_tasks())  # F5 to refresh
         # Ctrl+N for new task
         self.root.bind("<Control-n>", lambda e: self.clear_fields())
         # Delete key to delete selected task
@@ -167,27 +346,14 @@ class TaskSchedulerApp:
         self.root.bind(
             "<space>", lambda e: self.toggle_selected_task_completion())
 
-    def calculate_time_remaining(self, deadline_str):
-        """Calculate time remaining until deadline in days, hours, minutes format"""
-        if not deadline_str:
+    def calculate_time_remaining(self, deadline, now):
+        """Time from now until a deadline datetime in days, hours, minutes format"""
+        if deadline is None:
             return "No deadline"
-        
-        try:
-            from datetime import datetime
-            deadline = datetime.fromisoformat(str(deadline_str))
-            now = datetime.now()
-            
-            if deadline < now:
-                # Past deadline
-                diff = now - deadline
-                return f"Overdue by {self.format_duration(diff)}"
-            else:
-                # Future deadline
-                diff = deadline - now
-                return self.format_duration(diff)
-        except:
-            return "Invalid date"
-    
+        if deadline < now:
+            return f"Overdue by {self.format_duration(now - deadline)}"
+        return self.format_duration(deadline - now)
+
     def format_duration(self, duration):
         """Format a timedelta into days, hours, minutes"""
         total_seconds = int(duration.total_seconds())
@@ -209,14 +375,112 @@ class TaskSchedulerApp:
         
         return ", ".join(parts)
 
-    def get_db_connection(self):
-        """Get a fresh database connection"""
-        try:
-            return get_connection()
-        except Exception as e:
-            print(f"Database connection error: {e}")
-            self.status_var.set(f"Database connection error: {e}")
-            return None
+    # ---------- BACKGROUND DATABASE ACCESS ----------
+    def run_db(self, func, *args, on_success=None, on_error=None, serial=False,
+               error_message="Database error", **kwargs):
+        """Run func on the database worker; callbacks run on the Tk thread.
+
+        Mutations pass serial=True so they commit, and their rows reach the
+        view, in the order they were made.  Returns False (and says so in
+        the status bar) if too many operations are already pending.
+        """
+        def report_error(e):
+            if isinstance(e, ValueError):
+                self.status_var.set(f"Error: {e}")
+            else:
+                self.status_var.set(f"{error_message}: {e}")
+            if on_error:
+                on_error(e)
+
+        if not self.worker.submit(func, *args, on_success=on_success,
+                                  on_error=report_error, serial=serial, **kwargs):
+            self.status_var.set("Busy: too many pending database operations, try again")
+            return False
+        if self.diagnostics:
+            self.diagnostics.operation()
+        return True
+
+    def set_busy(self, busy):
+        """Show or hide the busy indicator"""
+        if busy:
+            self.busy_bar.pack(side="right")
+            self.busy_bar.start(10)
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+
+    def connect_database(self):
+        """Initialize and test the database in the background, then load tasks"""
+        self.status_var.set("Connecting to database...")
+
+        def on_ready(_):
+            print("Database connection successful!")
+            self.db_connected = True
+            self.root.title(f"Smart Task Scheduler - Pan-Atlantic University ({current_user()})")
+            self.load_tasks()
+            self.load_task_queue()
+            self.load_reminders()
+            self.show_alerts()
+            # Backends without change notifications have nothing to poll
+            if start_task_listener() is not None:
+                self.poll_task_changes()
+
+        def on_failed(e):
+            print(f"Database error: {e}")
+            self.db_connected = False
+
+        self.run_db(init_database, on_success=on_ready, on_error=on_failed, serial=True)
+
+    def begin_list_request(self):
+        """Invalidate outstanding list and search results; returns the new generation"""
+        if self.search_request is not None:
+            self.search_request.cancel()
+            self.search_request = None
+        self.list_generation += 1
+        return self.list_generation
+
+    def on_tasks_changed(self, tasks, removed_ids=()):
+        """Patch the view with rows returned by a mutation and drop removed ones"""
+        self.data_version += 1
+        shown = tasks
+        if self.pending_var.get():
+            # Completed tasks leave the pending-only list
+            shown = [task for task in tasks if not task.completed]
+            removed_ids = list(removed_ids) + [task.id for task in tasks if task.completed]
+        if removed_ids:
+            self.remove_task_rows(removed_ids)
+        if shown:
+            self.patch_task_rows(shown)
+        if self.task_queue is not None:
+            for task_id in removed_ids:
+                self.task_queue.remove(task_id)
+            for task in tasks:
+                self.task_queue.push(task)
+        self.notifier.remove(removed_ids)
+        self.notifier.update(tasks)
+        self.update_task_statistics()
+
+    def on_task_changed(self, task_id, task):
+        """Single-row form of on_tasks_changed (task is None if it is gone)"""
+        if task:
+            self.on_tasks_changed([task])
+        else:
+            self.on_tasks_changed([], [task_id])
+
+    def poll_task_changes(self):
+        """Apply tasks changed by other app instances to the view"""
+        changes = get_task_changes()
+        if None in changes:
+            self.refresh_tasks()  # too much changed to patch
+            self.load_reminders()
+        else:
+            for rows, removed_ids in changes:
+                self.on_tasks_changed(rows, removed_ids)
+        self.root.after(CHANGE_POLL_MS, self.poll_task_changes)
+
+    def selected_task_ids(self):
+        """Ids of all selected tasks (Treeview item ids are task ids)"""
+        return [int(iid) for iid in self.tree.selection()]
 
     def show_datetime_picker(self):
         from tkinter import simpledialog
@@ -235,86 +499,602 @@ class TaskSchedulerApp:
             self.status_var.set("Database not connected")
             return
 
-        conn = self.get_db_connection()
-        if not conn:
+        if self.paged_var.get():
+            self.load_first_page()
+            self.update_task_statistics()
             return
+        self.paging = False
 
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id, title, priority, deadline, completed FROM tasks")
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            for task in cursor.fetchall():
-                status = "✓ Completed" if task[4] else "⚬ Pending"  # completed is now at index 4
-                
-                # Calculate time remaining automatically
-                time_remaining = self.calculate_time_remaining(task[3])  # deadline at index 3
-                
-                # Add color coding for overdue tasks
-                tags = ()
-                if not task[4] and task[3]:  # Not completed and has deadline
-                    try:
-                        from datetime import datetime
-                        deadline_dt = datetime.fromisoformat(str(task[3]))
-                        if deadline_dt < datetime.now():
-                            tags = ("overdue",)
-                            status = "⚠ Overdue"
-                    except:
-                        pass
-                elif task[4]:  # Completed tasks
-                    tags = ("completed",)
-
-                # Format datetime for display (show first 16 chars: YYYY-MM-DD HH:MM)
-                deadline_display = str(task[3])[:16] if task[3] else "N/A"
-                
-                self.tree.insert("", "end", values=(
-                    task[0], task[1], task[2], deadline_display, time_remaining, status), tags=tags)
-
-            # Configure tags for visual feedback
-            self.tree.tag_configure("overdue", background="#ffcccc")
-            self.tree.tag_configure("completed", background="#ccffcc")
+        generation = self.begin_list_request()
+        version = self.data_version
+
+        sort, descending = self.list_sort("id")
+
+        def on_loaded(tasks):
+            if generation != self.list_generation:
+                return
+            self.show_list(tasks, (sort, descending))
             self.status_var.set("Tasks loaded successfully")
-        except Exception as e:
-            self.status_var.set(f"Error loading tasks: {str(e)}")
-        finally:
-            conn.close()
+            if version != self.data_version:
+                self.load_tasks()  # a change landed while loading
+
+        self.run_db(get_task_rows, sort, descending, self.pending_var.get(),
+                    on_success=on_loaded, error_message="Error loading tasks")
 
         # Update statistics after loading
         self.update_task_statistics()
 
-    def sort_tasks(self, sort_by):
-        items = [(self.tree.item(item)['values'], item)
-                 for item in self.tree.get_children()]
+    def list_sort(self, default):
+        """(sort, descending) for the task list, default until a header is clicked"""
+        if self.sort_column is None:
+            return default, False
+        return COLUMN_SORTS[self.sort_column], self.sort_descending
 
-        if sort_by == "priority":
-            # Sort by priority (High, Medium, Low)
-            priority_order = {'High': 1, 'Medium': 2, 'Low': 3}
-            items.sort(key=lambda x: priority_order.get(
-                x[0][2], 4))  # Default to 4 if missing
+    def sort_by_column(self, column):
+        """Sort the list by a column header in the database; clicking again reverses it"""
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        for col in self.tree["columns"]:
+            arrow = ""
+            if col == column:
+                arrow = " ▼" if self.sort_descending else " ▲"
+            self.tree.heading(col, text=col + arrow)
+        self.load_tasks()
+
+    def refresh_tasks(self):
+        """Reload tasks and statistics, bypassing the statistics cache"""
+        invalidate_statistics()
+        self.load_tasks()
+        self.load_task_queue()
+
+    def task_row_view(self, task, now):
+        """Build Treeview values and tags for a list row (engine.TaskRow)"""
+        deadline = task.deadline
+        tags = ()
+        if task.completed:
+            status = "✓ Completed"
+            tags = ("completed",)
+        elif deadline is not None and deadline < now:
+            status = "⚠ Overdue"
+            tags = ("overdue",)
+        else:
+            status = "⚬ Pending"
+
+        time_remaining = self.calculate_time_remaining(deadline, now)
+
+        # Format datetime for display (show first 16 chars: YYYY-MM-DD HH:MM)
+        deadline_display = str(deadline)[:16] if deadline else "N/A"
+
+        # Step: position in the prerequisite order, 1 = nothing to wait for
+        values = (task.id, task.title, task.priority, deadline_display, time_remaining,
+                  status, task.dependency_level + 1)
+        return values, tags
+
+    def render_tasks(self, tasks):
+        """Make the Treeview show exactly these rows, touching only what changed.
+
+        Rows are keyed by task id (used as the Treeview item id), so rows that
+        are unchanged stay in place and only inserts, updates, removals and
+        reorders reach Tk.
+        """
+        order = [str(task.id) for task in tasks]
+        wanted_ids = set(order)
+        stale = [iid for iid in self.row_views if iid not in wanted_ids]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self.row_views[iid]
+                self.countdown_tasks.pop(iid, None)
+
+        now = datetime.now()
+        for task in tasks:
+            self.show_task_row(task, now)
+        self.order_rows(order)
+
+    def order_rows(self, order):
+        """Move Treeview rows into order, a list of every shown item id.
+
+        Rows already in the right relative order stay put.  When most rows
+        move, as after a header click, all of them are re-attached in one
+        set_children call; otherwise only the others are detached and
+        re-attached at their new positions.
+        """
+        current = self.tree.get_children()
+        if list(current) == order:
+            return
+        in_place = rows_in_place(order, {iid: index for index, iid in enumerate(current)})
+        if len(in_place) < len(order) // 2:
+            self.tree.set_children("", *order)
+            return
+        moved = [iid for iid in order if iid not in in_place]
+        self.tree.detach(*moved)
+        for index, iid in enumerate(order):
+            if iid not in in_place:
+                self.tree.move(iid, "", index)
+
+    def set_task_row(self, iid, values, tags):
+        """Insert or update one Treeview row if its contents changed"""
+        view = (values, tags)
+        previous = self.row_views.get(iid)
+        if previous == view:
+            return
+        if previous is None:
+            self.tree.insert("", "end", iid=iid, values=values, tags=tags)
+        else:
+            self.tree.item(iid, values=values, tags=tags)
+        self.row_views[iid] = view
+
+    def show_task_row(self, task, now):
+        """Display a list row and track it for countdown updates if it has one"""
+        iid = str(task.id)
+        values, tags = self.task_row_view(task, now)
+        self.set_task_row(iid, values, tags)
+        if task.deadline is not None and not task.completed:
+            self.countdown_tasks[iid] = task
+        else:
+            self.countdown_tasks.pop(iid, None)
+
+    def show_list(self, tasks, sort):
+        """Show the whole task list, sorted by sort as (sort, descending)"""
+        self.shown_search = None
+        self.window_sort = sort
+        self.window_rows = tasks
+        self.render_tasks(tasks)
+
+    def patch_task_rows(self, tasks):
+        """Apply rows returned by a mutation to the view without re-querying the list.
+
+        Rows go where their sort keys place them.  Only the database can
+        tell whether a changed task still matches a search, so shown
+        search results are searched again instead.
+        """
+        if self.shown_search is not None:
+            self.start_search(self.shown_search)
+        elif self.paging:
+            self.patch_window_rows(tasks)
+        else:
+            self.patch_list_rows(tasks)
+
+    def patch_list_rows(self, tasks):
+        """Place changed rows in the full list by binary search on their sort keys"""
+        changed = {task.id for task in tasks}
+        rows = [row for row in self.window_rows if row.id not in changed]
+        for task in tasks:
+            rows.insert(sorted_position(rows, task, self.window_sort), task)
+        self.window_rows = rows
+        now = datetime.now()
+        for task in tasks:
+            self.show_task_row(task, now)
+        self.order_rows([str(row.id) for row in rows])
+
+    def remove_task_rows(self, task_ids):
+        removed = set(task_ids)
+        self.window_rows = [row for row in self.window_rows if row.id not in removed]
+        iids = [str(task_id) for task_id in removed
+                if self.row_views.pop(str(task_id), None) is not None]
+        for iid in iids:
+            self.countdown_tasks.pop(iid, None)
+        if iids:
+            self.tree.delete(*iids)
+
+    # ---------- COUNTDOWNS ----------
+    def schedule_countdowns(self):
+        """Run update_countdowns at the start of every minute"""
+        now = datetime.now()
+        delay = 60000 - (now.second * 1000 + now.microsecond // 1000)
+        self.root.after(delay, self.tick_countdowns)
+
+    def tick_countdowns(self):
+        self.update_countdowns()
+        self.schedule_countdowns()
+
+    def refresh_visible_countdowns(self):
+        """Update countdowns of rows scrolled into view, once per idle period"""
+        if not self.countdown_refresh_pending:
+            self.countdown_refresh_pending = True
+            self.root.after_idle(self.update_countdowns)
+
+    def update_countdowns(self):
+        """Recompute Time Remaining and overdue status of the visible rows.
+
+        Only pending rows with a deadline are looked at, all against one
+        clock reading, and only rows whose text or tags changed reach Tk.
+        Rows out of view catch up when they are scrolled into it.
+        """
+        self.countdown_refresh_pending = False
+        if not self.countdown_tasks:
+            return
+        children = self.tree.get_children()
+        first, last = self.tree.yview()
+        start = int(first * len(children))
+        end = min(len(children), int(last * len(children)) + 1)
+        now = datetime.now()
+        for iid in children[start:end]:
+            task = self.countdown_tasks.get(iid)
+            if task is not None:
+                values, tags = self.task_row_view(task, now)
+                self.set_task_row(iid, values, tags)
+
+    # ---------- PAGED VIEW ----------
+    def load_first_page(self):
+        """Show the first page of the paged view in the current sort order"""
+        generation = self.begin_list_request()
+        self.paging = True
+        self.page_pending = True
+        self.window_sort = self.list_sort("deadline")
+
+        def on_page(rows):
+            self.page_pending = False
+            if generation != self.list_generation:
+                return
+            self.shown_search = None
+            self.window_rows = rows
+            self.window_at_start = True
+            self.window_at_end = len(rows) < self.page_size
+            self.render_tasks(rows)
+            self.tree.yview_moveto(0)
+            self.status_var.set(f"Paged view: showing first {len(rows)} task(s)")
+
+        self.request_page(on_page, limit=self.page_size)
+
+    def request_page(self, on_page, **kwargs):
+        """Fetch a page on the worker, clearing page_pending if that fails"""
+        def on_error(e):
+            self.page_pending = False
+
+        sort, descending = self.window_sort
+        if not self.run_db(get_task_page, on_success=on_page, on_error=on_error,
+                           error_message="Error loading tasks", sort=sort,
+                           descending=descending, pending=self.pending_var.get(),
+                           **kwargs):
+            self.page_pending = False
+
+    def on_tree_scroll(self, first, last):
+        """Scrollbar hook that pulls in pages as the view nears either end"""
+        self.scrollbar.set(first, last)
+        self.refresh_visible_countdowns()
+        if not self.paging or self.page_pending or not self.window_rows:
+            return
+        if float(last) >= 1 - PAGE_EDGE and not self.window_at_end:
+            self.page_pending = True
+            self.root.after_idle(self.load_next_page)
+        elif float(first) <= PAGE_EDGE and not self.window_at_start:
+            self.page_pending = True
+            self.root.after_idle(self.load_previous_page)
+
+    def first_visible_index(self):
+        return int(round(self.tree.yview()[0] * len(self.window_rows)))
+
+    def load_next_page(self):
+        if not self.paging or not self.window_rows:
+            self.page_pending = False
+            return
+        generation = self.list_generation
+        last = self.window_rows[-1]
+
+        def on_page(rows):
+            self.page_pending = False
+            if generation != self.list_generation:
+                return
+            self.window_at_end = len(rows) < self.page_size
+            if not rows:
+                return
+
+            top = self.first_visible_index()
+            self.window_rows.extend(rows)
+            excess = len(self.window_rows) - self.page_size * WINDOW_PAGES
+            if excess > 0:
+                # Drop rows scrolled far above the view and keep its position
+                del self.window_rows[:excess]
+                self.window_at_start = False
+            self.render_tasks(self.window_rows)
+            if excess > 0:
+                self.tree.yview_moveto(max(top - excess, 0) / len(self.window_rows))
+
+        self.request_page(on_page, after=last, limit=self.page_size)
+
+    def load_previous_page(self):
+        if not self.paging or not self.window_rows:
+            self.page_pending = False
+            return
+        generation = self.list_generation
+        first = self.window_rows[0]
+
+        def on_page(rows):
+            self.page_pending = False
+            if generation != self.list_generation:
+                return
+            self.window_at_start = len(rows) < self.page_size
+            if not rows:
+                return
+
+            top = self.first_visible_index()
+            self.window_rows[:0] = rows
+            excess = len(self.window_rows) - self.page_size * WINDOW_PAGES
+            if excess > 0:
+                del self.window_rows[-excess:]
+                self.window_at_end = False
+            self.render_tasks(self.window_rows)
+            self.tree.yview_moveto((top + len(rows)) / len(self.window_rows))
+
+        self.request_page(on_page, before=first, limit=self.page_size)
+
+    def patch_window_rows(self, tasks):
+        """Place changed rows in the paged window where their keys fall inside it"""
+        changed = {task.id for task in tasks}
+        rows = [row for row in self.window_rows if row.id not in changed]
+        keys = [task_sort_key(row, *self.window_sort) for row in rows]
+        for task in tasks:
+            key = task_sort_key(task, *self.window_sort)
+            if not rows or ((self.window_at_start or not key < keys[0])
+                            and (self.window_at_end or not keys[-1] < key)):
+                index = bisect(keys, key)
+                rows.insert(index, task)
+                keys.insert(index, key)
+        self.window_rows = rows
+        self.render_tasks(rows)
+
+    # ---------- SCHEDULING ----------
+    def load_task_queue(self):
+        """Build the scheduling queue of pending tasks in the background"""
+        version = self.data_version
+
+        def on_loaded(task_queue):
+            if version != self.data_version:
+                self.load_task_queue()  # a change landed while loading
+                return
+            self.task_queue = task_queue
+
+        self.run_db(get_task_queue, on_success=on_loaded,
+                    error_message="Error loading task queue")
+
+    def load_reminders(self):
+        """Load reminders for every upcoming deadline and start the notifier"""
+        version = self.data_version
+
+        def on_loaded(tasks):
+            if version != self.data_version:
+                self.load_reminders()  # a change landed while loading
+                return
+            self.notifier.load(tasks)
+            self.notifier.start()
+
+        self.run_db(get_upcoming_deadlines, on_success=on_loaded,
+                    error_message="Error loading deadline reminders")
+
+    def show_alerts(self):
+        """List reminders the notifier has fired, then check again after ALERT_POLL_MS"""
+        alerts = []
+        while True:
+            try:
+                alerts.append(self.alerts.get_nowait())
+            except queue.Empty:
+                break
+        if alerts:
+            if self.alert_window is None:
+                self.create_alert_window()
+            now = datetime.now().strftime("%H:%M")
+            for task, lead in alerts:
+                self.alert_list.insert(0, f"{now}  {alert_message(task, lead)}")
+            self.alert_list.delete(ALERT_ROWS, tk.END)
+            self.alert_window.deiconify()
+            self.alert_window.lift()
+            self.root.bell()
+            self.status_var.set(alert_message(*alerts[-1]))
+        self.root.after(ALERT_POLL_MS, self.show_alerts)
+
+    def create_alert_window(self):
+        """Build the Deadline Alerts window; closing it only hides it"""
+        self.alert_window = tk.Toplevel(self.root)
+        self.alert_window.title("Deadline Alerts")
+        self.alert_window.geometry("500x250")
+        self.alert_window.protocol("WM_DELETE_WINDOW", self.alert_window.withdraw)
+        self.alert_list = tk.Listbox(self.alert_window)
+        scrollbar = ttk.Scrollbar(self.alert_window, orient="vertical",
+                                  command=self.alert_list.yview)
+        self.alert_list.configure(yscrollcommand=scrollbar.set)
+        self.alert_list.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+    # ---------- ARCHIVE ----------
+    def show_archive(self):
+        """Show the Archived Tasks window with the newest archived tasks"""
+        if not self.db_connected:
+            self.status_var.set("Database not connected")
+            return
+        if self.archive_window is None:
+            self.create_archive_window()
+        self.archive_window.deiconify()
+        self.archive_window.lift()
+        self.load_archive()
+
+    def create_archive_window(self):
+        """Build the Archived Tasks window; closing it only hides it"""
+        window = self.archive_window = tk.Toplevel(self.root)
+        window.title("Archived Tasks")
+        window.geometry("600x400")
+        window.protocol("WM_DELETE_WINDOW", window.withdraw)
+
+        top = ttk.Frame(window)
+        top.pack(fill="x", padx=5, pady=5)
+        self.archive_search_var = tk.StringVar()
+        entry = ttk.Entry(top, textvariable=self.archive_search_var, width=30)
+        entry.pack(side="left", padx=5)
+        entry.bind("<Return>", lambda e: self.load_archive())
+        ttk.Button(top, text="Search",
+                   command=self.load_archive).pack(side="left", padx=5)
+        ttk.Button(top, text="Restore",
+                   command=self.restore_archived_tasks).pack(side="right", padx=5)
+        ttk.Button(top, text="Archive Completed...",
+                   command=self.archive_completed).pack(side="right", padx=5)
+
+        bottom = ttk.Frame(window)
+        bottom.pack(side="bottom", fill="x", padx=5, pady=5)
+        self.archive_more_btn = ttk.Button(bottom, text="Load More",
+                                           command=self.load_more_archive)
+        self.archive_more_btn.pack(side="left")
+        self.archive_status_var = tk.StringVar()
+        ttk.Label(bottom, textvariable=self.archive_status_var).pack(side="left", padx=10)
+
+        columns = ("ID", "Title", "Priority", "Deadline")
+        self.archive_tree = ttk.Treeview(window, columns=columns, show="headings",
+                                         selectmode="extended")
+        for col in columns:
+            self.archive_tree.heading(col, text=col)
+            self.archive_tree.column(col, width=250 if col == "Title" else 100)
+        scrollbar = ttk.Scrollbar(window, orient="vertical",
+                                  command=self.archive_tree.yview)
+        self.archive_tree.configure(yscrollcommand=scrollbar.set)
+        self.archive_tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+    def load_archive(self):
+        """Show the first page of archived tasks, or those matching the search box"""
+        self.archive_generation += 1
+        generation = self.archive_generation
+        keyword = self.archive_search_var.get().strip()
+
+        def on_loaded(rows):
+            if generation != self.archive_generation:
+                return
+            self.archive_tree.delete(*self.archive_tree.get_children())
+            self.show_archive_rows(rows, more=not keyword and len(rows) == self.page_size)
+
+        if keyword:
+            self.run_db(search_archived_tasks, keyword, on_success=on_loaded,
+                        error_message="Error searching archived tasks")
+        else:
+            self.run_db(get_archive_page, limit=self.page_size, on_success=on_loaded,
+                        error_message="Error loading archived tasks")
+
+    def load_more_archive(self):
+        """Append the next page of archived tasks"""
+        generation = self.archive_generation
+
+        def on_loaded(rows):
+            if generation == self.archive_generation:
+                self.show_archive_rows(rows, more=len(rows) == self.page_size)
+
+        def on_error(e):
+            self.archive_more_btn.state(["!disabled"])
+
+        self.archive_more_btn.state(["disabled"])
+        if not self.run_db(get_archive_page, after=self.archive_last_id, limit=self.page_size,
+                           on_success=on_loaded, on_error=on_error,
+                           error_message="Error loading archived tasks"):
+            on_error(None)
+
+    def show_archive_rows(self, rows, more):
+        for task in rows:
+            deadline = str(task.deadline)[:16] if task.deadline else "N/A"
+            self.archive_tree.insert("", "end", iid=str(task.id),
+                                     values=(task.id, task.title, task.priority, deadline))
+        if rows:
+            self.archive_last_id = rows[-1].id
+        self.archive_more_btn.state(["!disabled"] if more else ["disabled"])
+        shown = len(self.archive_tree.get_children())
+        self.archive_status_var.set(f"{shown} archived task(s) shown")
+
+    def archive_completed(self):
+        """Move tasks completed more than a chosen number of days ago to the archive"""
+        days = simpledialog.askinteger(
+            "Archive Completed Tasks", "Archive tasks completed more than how many days ago?",
+            initialvalue=ARCHIVE_AFTER_DAYS or DEFAULT_ARCHIVE_DAYS, minvalue=0,
+            parent=self.archive_window or self.root)
+        if days is None:
+            return
+
+        def on_archived(task_ids):
+            self.on_tasks_changed([], task_ids)
+            self.status_var.set(f"{len(task_ids)} task(s) archived")
+            if self.archive_window is not None and self.archive_window.winfo_viewable():
+                self.load_archive()
 
-        elif sort_by == "urgency":
-            # Sort by deadline proximity (nearest first)
-            today = datetime.now().date()
+        self.run_db(archive_completed_tasks, days, on_success=on_archived,
+                    error_message="Error archiving tasks", serial=True)
 
-            def urgency_key(x):
-                try:
-                    deadline = datetime.strptime(x[0][3], "%Y-%m-%d").date()
-                    return (deadline - today).days
-                except (ValueError, IndexError):
-                    return float('inf')  # Push invalid/missing dates to bottom
+    def restore_archived_tasks(self):
+        """Move the tasks selected in the Archived Tasks window back to the list"""
+        task_ids = [int(iid) for iid in self.archive_tree.selection()]
+        if not task_ids:
+            self.archive_status_var.set("No archived task selected")
+            return
 
-            items.sort(key=urgency_key)
+        def on_restored(tasks):
+            restored = [str(task.id) for task in tasks]
+            if restored:
+                self.archive_tree.delete(*restored)
+            self.archive_status_var.set(f"{len(tasks)} task(s) restored")
+            self.on_tasks_changed(tasks)
 
-        # Clear the current tree and reinsert sorted items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.run_db(restore_tasks, task_ids, on_success=on_restored,
+                    error_message="Error restoring tasks", serial=True)
 
-        for values, _ in items:
-            self.tree.insert('', 'end', values=values)
+    def show_task_plan(self):
+        """Schedule pending tasks into working hours and show the timeline"""
+        if not self.db_connected:
+            self.status_var.set("Database not connected")
+            return
+
+        def on_planned(plan):
+            timeline, late = plan
+            late_ids = {task.id for task, _ in late}
+            if self.plan_window is not None and self.plan_window.winfo_exists():
+                self.plan_window.destroy()
+            window = self.plan_window = tk.Toplevel(self.root)
+            window.title("Task Plan")
+            window.geometry("700x450")
+
+            columns = ("Title", "Priority", "Start", "End", "Deadline")
+            tree = ttk.Treeview(window, columns=columns, show="headings")
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=180 if col == "Title" else 120)
+            tree.tag_configure("overdue", background="#ffcccc")
+            scrollbar = ttk.Scrollbar(window, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+
+            for task, start, end in timeline[:PLAN_ROWS]:
+                deadline = str(task.deadline)[:16] if task.deadline else "N/A"
+                tags = ("overdue",) if task.id in late_ids else ()
+                tree.insert("", "end", tags=tags, values=(
+                    task.title, task.priority, start.strftime("%Y-%m-%d %H:%M"),
+                    end.strftime("%Y-%m-%d %H:%M"), deadline))
+
+            summary = f"{len(late)} task(s) cannot meet their deadline"
+            if len(timeline) > PLAN_ROWS:
+                summary += f" (showing first {PLAN_ROWS} of {len(timeline)} slots)"
+            ttk.Label(window, text=summary,
+                      anchor="w").pack(side="bottom", fill="x", padx=5, pady=5)
+            tree.pack(side="left", fill="both", expand=True)
+            scrollbar.pack(side="right", fill="y")
+            self.status_var.set(f"Planned {len(timeline)} slot(s), {len(late)} late task(s)")
+
+        self.run_db(get_task_plan, on_success=on_planned,
+                    error_message="Error planning tasks")
+
+    def show_next_tasks(self):
+        """Show the most urgent pending tasks and select those in the list"""
+        if self.task_queue is None:
+            self.status_var.set("Task queue is still loading, try again")
+            return
+        tasks = self.task_queue.next()
+        if not tasks:
+            messagebox.showinfo("Next Up", "No pending tasks")
+            return
 
-        for index, (values, item) in enumerate(items):
-            self.tree.move(item, "", index)
+        lines = []
+        for position, task in enumerate(tasks, 1):
+            deadline = str(task.deadline)[:16] if task.deadline else "no deadline"
+            lines.append(f"{position}. {task.title} ({task.priority}, {deadline})")
+        visible = [str(task.id) for task in tasks if str(task.id) in self.row_views]
+        if visible:
+            self.tree.selection_set(visible)
+            self.tree.see(visible[0])
+        messagebox.showinfo("Next Up", "\n".join(lines))
 
     def show_task_description(self, event):
         """Show task description when double-clicked"""
@@ -323,100 +1103,199 @@ class TaskSchedulerApp:
             return
 
         task_id = self.tree.item(selected)["values"][0]
-        
-        conn = self.get_db_connection()
-        if not conn:
-            return
-
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT title, description FROM tasks WHERE id = %s", (task_id,))
-            task = cursor.fetchone()
 
+        def on_loaded(task):
             if task:
-                title, description = task
+                title, description = task.title, task.description
                 messagebox.showinfo(
                     "Task Description",
                     f"Title: {title}\n\nDescription:\n{description if description else 'No description available'}"
                 )
-        except Exception as e:
-            self.status_var.set(f"Error loading task description: {str(e)}")
-        finally:
-            conn.close()
+
+        self.run_db(get_task_details, task_id, on_success=on_loaded,
+                    error_message="Error loading task description")
+
+    def create_context_menu(self):
+        """Build the right-click menu once; show_context_menu relabels it.
+
+        Every Python callback given to a Tk menu stays registered until the
+        menu is destroyed, so the entries and their commands are created
+        here only and never reconfigured.
+        """
+        self.context_menu = tk.Menu(self.root, tearoff=0)
+        self.context_menu_completes = True
+
+        self.context_menu.add_command(label="Mark as Completed",
+                                      command=self.toggle_context_menu_completion)
+        self.context_menu_completion = self.context_menu.index("end")
+
+        priority_menu = tk.Menu(self.context_menu, tearoff=0)
+        for priority in ("High", "Medium", "Low"):
+            priority_menu.add_command(
+                label=priority,
+                command=lambda p=priority: self.set_selected_priority(p))
+        self.context_menu.add_cascade(label="Set Priority", menu=priority_menu)
+        self.context_menu_priority = self.context_menu.index("end")
+
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Add Prerequisite...",
+                                      command=self.add_prerequisite)
+        self.context_menu.add_command(label="Remove Prerequisite...",
+                                      command=self.remove_prerequisite)
+        self.context_menu.add_command(label="Show Critical Path",
+                                      command=self.show_critical_path)
+
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Edit Task", command=self.edit_task)
+        self.context_menu.add_command(label="Delete Task", command=self.delete_task)
+        self.context_menu_delete = self.context_menu.index("end")
+
+    def update_context_menu(self, selected):
+        """Label the context menu for the selected Treeview items"""
+        # Get task status
+        task_values = self.tree.item(selected[0])["values"]
+        current_status = task_values[5]  # Status is at index 5
+        count = f" ({len(selected)} tasks)" if len(selected) > 1 else ""
+
+        self.context_menu_completes = "Completed" not in current_status
+        action = "Mark as Completed" if self.context_menu_completes else "Mark as Pending"
+        self.context_menu.entryconfigure(self.context_menu_completion,
+                                         label=action + count)
+        self.context_menu.entryconfigure(self.context_menu_priority,
+                                         label=f"Set Priority{count}")
+        self.context_menu.entryconfigure(self.context_menu_delete,
+                                         label=f"Delete Task{count}")
 
     def show_context_menu(self, event):
-        """Show right-click context menu"""
+        """Show right-click context menu for the selected task(s)"""
         selected = self.tree.selection()
         if not selected:
             return
 
-        # Create context menu
-        context_menu = tk.Menu(self.root, tearoff=0)
+        self.update_context_menu(selected)
+        try:
+            self.context_menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            self.context_menu.grab_release()
 
-        # Get task status
-        task_values = self.tree.item(selected)["values"]
-        current_status = task_values[5]  # Status is at index 5
+    def toggle_context_menu_completion(self):
+        self.set_selected_completed(self.context_menu_completes)
 
-        if "Completed" in current_status:
-            context_menu.add_command(label="Mark as Pending",
-                                     command=lambda: self.toggle_task_completion(selected[0], False))
-        else:
-            context_menu.add_command(label="Mark as Completed",
-                                     command=lambda: self.toggle_task_completion(selected[0], True))
+    def set_selected_completed(self, completed):
+        """Mark every selected task completed or pending in one statement"""
+        task_ids = self.selected_task_ids()
+        if not task_ids:
+            self.status_var.set("Error: No task selected")
+            return
 
-        context_menu.add_separator()
-        context_menu.add_command(label="Edit Task", command=self.edit_task)
-        context_menu.add_command(label="Delete Task", command=self.delete_task)
+        def on_updated(tasks):
+            status = "completed" if completed else "pending"
+            self.status_var.set(f"{len(tasks)} task(s) marked as {status}")
+            returned = {task.id for task in tasks}
+            self.on_tasks_changed(tasks, [i for i in task_ids if i not in returned])
 
-        try:
-            context_menu.tk_popup(event.x_root, event.y_root)
-        finally:
-            context_menu.grab_release()
+        self.run_db(set_tasks_completed, task_ids, completed,
+                    on_success=on_updated, error_message="Error updating task", serial=True)
+
+    def set_selected_priority(self, priority):
+        """Set the priority of every selected task in one statement"""
+        task_ids = self.selected_task_ids()
+        if not task_ids:
+            self.status_var.set("Error: No task selected")
+            return
+
+        def on_updated(tasks):
+            self.status_var.set(f"{len(tasks)} task(s) set to {priority} priority")
+            returned = {task.id for task in tasks}
+            self.on_tasks_changed(tasks, [i for i in task_ids if i not in returned])
+
+        self.run_db(set_tasks_priority, task_ids, priority,
+                    on_success=on_updated, error_message="Error updating task", serial=True)
 
-    def toggle_task_completion(self, item_id, completed):
-        """Toggle task completion status"""
-        task_id = self.tree.item(item_id)["values"][0]
+    def ask_prerequisite_id(self, title, task_id):
+        return simpledialog.askinteger(
+            title, f"ID of the task that must be done before task {task_id}:",
+            parent=self.root)
 
-        conn = self.get_db_connection()
-        if not conn:
+    def add_prerequisite(self):
+        """Make the selected task depend on another task, by ID"""
+        task_ids = self.selected_task_ids()
+        if not task_ids:
+            self.status_var.set("Error: No task selected")
+            return
+        task_id = task_ids[0]
+        depends_on = self.ask_prerequisite_id("Add Prerequisite", task_id)
+        if depends_on is None:
             return
 
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE tasks SET completed = %s WHERE id = %s", (completed, task_id))
-            conn.commit()
-
-            status = "Completed" if completed else "Pending"
-            self.status_var.set(f"Task marked as {status.lower()}")
-            self.load_tasks()  # Refresh the display
-
-        except Exception as e:
-            self.status_var.set(f"Error updating task: {str(e)}")
-            conn.rollback()
-        finally:
-            conn.close()
+        def on_added(tasks):
+            self.status_var.set(f"Task {task_id} now depends on task {depends_on}")
+            self.on_tasks_changed(tasks)
+
+        self.run_db(add_dependency, task_id, depends_on, on_success=on_added,
+                    error_message="Error adding prerequisite", serial=True)
+
+    def remove_prerequisite(self):
+        task_ids = self.selected_task_ids()
+        if not task_ids:
+            self.status_var.set("Error: No task selected")
+            return
+        task_id = task_ids[0]
+        depends_on = self.ask_prerequisite_id("Remove Prerequisite", task_id)
+        if depends_on is None:
+            return
+
+        def on_removed(removed):
+            if removed:
+                self.status_var.set(f"Task {task_id} no longer depends on task {depends_on}")
+            else:
+                self.status_var.set(f"Task {task_id} does not depend on task {depends_on}")
+
+        self.run_db(remove_dependency, task_id, depends_on, on_success=on_removed,
+                    error_message="Error removing prerequisite", serial=True)
+
+    def show_critical_path(self):
+        """Show the longest chain of prerequisites before the selected task"""
+        task_ids = self.selected_task_ids()
+        if not task_ids:
+            self.status_var.set("Error: No task selected")
+            return
+
+        def on_loaded(result):
+            path, minutes = result
+            if not path:
+                self.status_var.set("Error: Task not found")
+                return
+            lines = [f"{position}. {task.title}" + (" (done)" if task.completed else "")
+                     for position, task in enumerate(path, 1)]
+            lines.append("")
+            lines.append(f"Remaining work: {self.format_duration(timedelta(minutes=minutes))}")
+            messagebox.showinfo("Critical Path", "\n".join(lines))
+
+        self.run_db(get_critical_path, task_ids[0], on_success=on_loaded,
+                    error_message="Error loading critical path")
 
     def toggle_selected_task_completion(self):
-        """Toggle completion status of selected task via button"""
+        """Toggle completion of the selected task(s) via button or Space.
+
+        With several tasks selected, all are completed unless every one of
+        them already is, in which case all are marked pending.
+        """
         selected = self.tree.selection()
         if not selected:
             self.status_var.set("Error: No task selected")
             return
 
-        # Get current task status
-        task_values = self.tree.item(selected[0])["values"]
-        current_status = task_values[5]  # Status is at index 5
-
-        # Toggle the completion status
-        new_completed_status = "Completed" not in current_status
-
-        self.toggle_task_completion(selected[0], new_completed_status)
+        # Status is at index 5 of the displayed values
+        all_completed = all(
+            "Completed" in self.row_views[iid][0][5]
+            for iid in selected if iid in self.row_views)
+        self.set_selected_completed(not all_completed)
 
     def clear_search(self):
         """Clear search and show all tasks"""
         self.search_var.set("")
+        self.cancel_search()
         self.load_tasks()
         self.status_var.set("Showing all tasks")
 
@@ -425,38 +1304,24 @@ class TaskSchedulerApp:
         if not self.db_connected:
             return
 
-        conn = self.get_db_connection()
-        if not conn:
-            return
-
-        try:
-            cursor = conn.cursor()
-
-            # Get total tasks
-            cursor.execute("SELECT COUNT(*) FROM tasks")
-            total = cursor.fetchone()[0]
+        def on_stats(stats):
+            if stats is None:
+                self.stats_var.set("Statistics unavailable")
+                return
+            self.stats_var.set(
+                f"Total: {stats['total']} | Pending: {stats['pending']} | "
+                f"Completed: {stats['completed']} | Overdue: {stats['overdue']}")
 
-            # Get completed tasks
-            cursor.execute("SELECT COUNT(*) FROM tasks WHERE completed = true")
-            completed = cursor.fetchone()[0]
+        self.run_db(get_task_statistics, on_success=on_stats)
 
-            # Get pending tasks
-            pending = total - completed
+    def log_diagnostics(self):
+        """Log a diagnostics report to stderr, then again after DIAGNOSTICS_INTERVAL_MS"""
+        self.diagnostics.log()
+        self.root.after(DIAGNOSTICS_INTERVAL_MS, self.log_diagnostics)
 
-            # Get overdue tasks
-            cursor.execute("""
-                SELECT COUNT(*) FROM tasks 
-                WHERE completed = false AND deadline < CURRENT_DATE
-            """)
-            overdue = cursor.fetchone()[0]
-
-            self.stats_var.set(
-                f"Total: {total} | Pending: {pending} | Completed: {completed} | Overdue: {overdue}")
-
-        except Exception as e:
-            self.stats_var.set("Statistics unavailable")
-        finally:
-            conn.close()
+    def show_diagnostics(self):
+        """Show object and widget growth since startup (F12 in diagnostics mode)"""
+        messagebox.showinfo("Diagnostics", self.diagnostics.report())
 
     def show_help(self):
         """Show help dialog with usage instructions"""
@@ -501,62 +1366,60 @@ OTHER SHORTCUTS:
             self.status_var.set("Database not connected")
             return
 
-        conn = self.get_db_connection()
-        if not conn:
+        self.start_search(query)
+
+    def on_search_changed(self, *args):
+        """Restart the debounce timer on every keystroke in the search box"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(
+            SEARCH_DEBOUNCE_MS, self.run_live_search)
+
+    def run_live_search(self):
+        self.search_after_id = None
+        query = self.search_var.get().strip()
+        if not self.db_connected:
             return
+        if query:
+            self.start_search(query)
+        else:
+            self.cancel_search()
+            self.load_tasks()
 
-        try:
-            cursor = conn.cursor()
-            search_term = f"%{query}%"
-            cursor.execute("""
-                SELECT id, title, priority, deadline, completed 
-                FROM tasks 
-                WHERE title ILIKE %s OR description ILIKE %s
-                ORDER BY deadline
-            """, (search_term, search_term))
-
-            # Clear existing items
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            # Add search results to treeview
-            results = cursor.fetchall()
-            for task in results:
-                status = "✓ Completed" if task[4] else "⚬ Pending"  # completed is now at index 4
-                
-                # Calculate time remaining automatically
-                time_remaining = self.calculate_time_remaining(task[3])  # deadline at index 3
-                
-                # Add color coding for overdue tasks
-                tags = ()
-                if not task[4] and task[3]:  # Not completed and has deadline
-                    try:
-                        from datetime import datetime
-                        deadline_dt = datetime.fromisoformat(str(task[3]))
-                        if deadline_dt < datetime.now():
-                            tags = ("overdue",)
-                            status = "⚠ Overdue"
-                    except:
-                        pass
-                elif task[4]:  # Completed tasks
-                    tags = ("completed",)
-
-                # Format datetime for display
-                deadline_display = str(task[3])[:16] if task[3] else "N/A"
-
-                self.tree.insert("", "end", values=(
-                    task[0], task[1], task[2], deadline_display, time_remaining, status), tags=tags)
-
-            self.status_var.set(
-                f"Found {len(results)} task(s) matching '{query}'")
-
-            # Configure tags for visual feedback
-            self.tree.tag_configure("overdue", background="#ffcccc")
-
-        except Exception as e:
-            self.status_var.set(f"Error searching tasks: {str(e)}")
-        finally:
-            conn.close()
+    def cancel_search(self):
+        """Drop any pending or running search so its results are never shown"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        self.begin_list_request()
+
+    def start_search(self, query):
+        """Run a search on the worker, cancelling the previous one"""
+        self.cancel_search()
+        request = SearchRequest(query)
+        self.search_request = request
+        generation = self.list_generation
+
+        def on_results(results):
+            if generation != self.list_generation:
+                return  # superseded by a newer search or load
+            self.search_request = None
+            if results is None:
+                self.status_var.set(f"Search for '{query}' timed out")
+                return
+            self.paging = False
+            self.shown_search = query
+            self.render_tasks(results)
+            if len(results) >= SEARCH_LIMIT:
+                self.status_var.set(
+                    f"Showing the {len(results)} best matches for '{query}'")
+            else:
+                self.status_var.set(
+                    f"Found {len(results)} task(s) matching '{query}'")
+
+        self.status_var.set(f"Searching for '{query}'...")
+        self.run_db(request.run, on_success=on_results,
+                    error_message="Error searching tasks")
 
     def add_task(self):
         if not self.db_connected:
@@ -567,30 +1430,21 @@ OTHER SHORTCUTS:
         description = self.desc_text.get("1.0", tk.END).strip()
         priority = self.priority_var.get()
         deadline = self.deadline_entry.get()
+        duration = self.duration_entry.get()
 
         if not title:
             self.status_var.set("Error: Title is required")
             return
 
-        conn = self.get_db_connection()
-        if not conn:
-            return
-
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO tasks (title, description, priority, deadline, completed) VALUES (%s, %s, %s, %s, %s) RETURNING id",
-                (title, description, priority, deadline, False)
-            )
-            conn.commit()
-            self.status_var.set(f"Task '{title}' added successfully")
+        def on_added(task):
             self.clear_fields()
-            self.load_tasks()
-        except Exception as e:
-            self.status_var.set(f"Database error: {str(e)}")
-            conn.rollback()
-        finally:
-            conn.close()
+            self.status_var.set(f"Task '{title}' added successfully")
+            self.on_task_changed(task.id, task)
+            if self.tree.exists(str(task.id)):
+                self.tree.see(str(task.id))
+
+        self.run_db(insert_task_row, title, description, priority, deadline, duration,
+                    on_success=on_added, serial=True)
 
     def edit_task(self):
         selected = self.tree.selection()
@@ -599,89 +1453,65 @@ OTHER SHORTCUTS:
             return
 
         task_id = self.tree.item(selected)["values"][0]
-        
-        conn = self.get_db_connection()
-        if not conn:
-            return
-            
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT title, description, priority, deadline FROM tasks WHERE id = %s", (task_id,))
-            task = cursor.fetchone()
 
+        def on_loaded(task):
             if task:
                 self.title_entry.delete(0, tk.END)
-                self.title_entry.insert(0, task[0])
+                self.title_entry.insert(0, task.title)
                 self.desc_text.delete("1.0", tk.END)
-                self.desc_text.insert("1.0", task[1])
-                self.priority_var.set(task[2])
-                
+                self.desc_text.insert("1.0", task.description or "")
+                self.priority_var.set(task.priority)
+
                 # Set the datetime picker
                 self.deadline_entry.delete(0, tk.END)
-                self.deadline_entry.insert(0, str(task[3])[:16] if task[3] else "")
+                self.deadline_entry.insert(0, str(task.deadline)[:16] if task.deadline else "")
+                self.duration_entry.set(task.duration or "")
                 self.add_btn.config(text="Update Task",
                                     command=lambda: self.update_task(task_id))
                 self.status_var.set(f"Editing Task ID: {task_id}")
-        except Exception as e:
-            self.status_var.set(f"Error loading task: {str(e)}")
-        finally:
-            conn.close()
+
+        self.run_db(get_task_details, task_id, on_success=on_loaded,
+                    error_message="Error loading task")
 
     def update_task(self, task_id):
         title = self.title_entry.get().strip()
         description = self.desc_text.get("1.0", tk.END).strip()
         priority = self.priority_var.get()
         deadline = self.deadline_entry.get()
+        duration = self.duration_entry.get()
 
         if not title:
             self.status_var.set("Error: Title is required")
             return
 
-        conn = self.get_db_connection()
-        if not conn:
-            return
-
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE tasks SET title=%s, description=%s, priority=%s, deadline=%s WHERE id=%s",
-                (title, description, priority, deadline, task_id)
-            )
-            conn.commit()
-            self.status_var.set(f"Task '{title}' updated successfully")
+        def on_updated(task):
             self.clear_fields()
             self.add_btn.config(text="Add Task", command=self.add_task)
-            self.load_tasks()
-        except Exception as e:
-            self.status_var.set(f"Error updating task: {str(e)}")
-            conn.rollback()
-        finally:
-            conn.close()
+            self.status_var.set(f"Task '{title}' updated successfully")
+            self.on_task_changed(task_id, task)
+
+        self.run_db(update_task_row, task_id, title, description, priority, deadline,
+                    duration, on_success=on_updated, error_message="Error updating task",
+                    serial=True)
 
     def delete_task(self):
-        selected = self.tree.selection()
-        if not selected:
+        task_ids = self.selected_task_ids()
+        if not task_ids:
             self.status_var.set("Error: No task selected")
             return
-
-        task_id = self.tree.item(selected)["values"][0]
-
-        conn = self.get_db_connection()
-        if not conn:
+        if len(task_ids) > 1 and not messagebox.askyesno(
+                "Delete Tasks", f"Delete {len(task_ids)} selected tasks?"):
             return
 
-        try:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
-            conn.commit()
-            self.status_var.set("Task deleted successfully")
-            self.load_tasks()
-        except Exception as e:
-            self.status_var.set(f"Error deleting task: {str(e)}")
-            conn.rollback()
-        finally:
-            conn.close()
+        def on_deleted(deleted):
+            if len(task_ids) == 1:
+                self.status_var.set("Task deleted successfully")
+            else:
+                self.status_var.set(f"{len(deleted)} task(s) deleted")
+            self.on_tasks_changed([], task_ids)
+
+        self.run_db(delete_tasks, task_ids, on_success=on_deleted,
+                    error_message="Error deleting task", serial=True)
 
     def clear_fields(self):
         self.title_entry.delete(0, tk.END)
@@ -689,6 +1519,7 @@ OTHER SHORTCUTS:
         self.priority_var.set("Medium")
         self.deadline_entry.delete(0, tk.END)
         self.deadline_entry.insert(0, datetime.now().strftime("%Y-%m-%d %H:%M"))
+        self.duration_entry.set(60)
         self.add_btn.config(text="Add Task", command=self.add_task)
         self.status_var.set("Ready")
 
@@ -697,3 +1528,6 @@ if __name__ == "__main__":
     root = tb.Window(themename="flatly")
     app = TaskSchedulerApp(root)
     root.mainloop()
+    app.worker.shutdown()
+    app.notifier.stop()
+    close_database()
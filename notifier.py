@@ -0,0 +1,269 @@
+"""Deadline reminders for pending tasks.
+
+DeadlineNotifier keeps one reminder per lead time for every pending task
+with a deadline and calls on_alert(task, lead) from a background thread
+as each one comes due.  Run this module to get reminders without the
+app open:
+
+    python notifier.py            # print reminders
+    python notifier.py --desktop  # also show them with notify-send
+"""
+import argparse
+import heapq
+import itertools
+import os
+import shutil
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta
+
+from engine import (close_database, get_task_changes, get_upcoming_deadlines,
+                    init_database, start_task_listener)
+
+# Minutes before a deadline at which reminders fire; 0 fires at the deadline
+DEFAULT_LEAD_MINUTES = (24 * 60, 60, 0)
+
+# Environment variable overriding DEFAULT_LEAD_MINUTES, e.g. "1440,60,0"
+REMINDER_LEADS_ENV = "TASK_SCHEDULER_REMINDERS"
+
+# Longest the notifier thread sleeps without checking the clock, so a
+# change to the system clock is noticed
+NOTIFIER_MAX_WAIT = 60
+
+# Seconds between change checks in the standalone notifier
+CHANGE_POLL = 1.0
+# Seconds between reloads of upcoming deadlines when the storage backend
+# has no change notifications (SQLite)
+NOTIFIER_RELOAD = 300
+
+
+def reminder_leads():
+    """Lead times from REMINDER_LEADS_ENV (or the defaults), longest first"""
+    minutes = DEFAULT_LEAD_MINUTES
+    value = os.environ.get(REMINDER_LEADS_ENV, "")
+    if value.strip():
+        minutes = [int(m) for m in value.split(",") if m.strip()]
+    if any(m < 0 for m in minutes):
+        raise ValueError(f"{REMINDER_LEADS_ENV} lead times must not be negative")
+    return tuple(sorted({timedelta(minutes=m) for m in minutes}, reverse=True))
+
+
+def format_lead(lead):
+    """A lead time as "1 day", "2 hours", "1 day 30 minutes" and so on"""
+    minutes = int(lead.total_seconds()) // 60
+    parts = []
+    for unit, size in (("day", 24 * 60), ("hour", 60), ("minute", 1)):
+        count, minutes = divmod(minutes, size)
+        if count:
+            parts.append(f"{count} {unit}{'s' if count != 1 else ''}")
+    return " ".join(parts) or "0 minutes"
+
+
+def alert_message(task, lead):
+    if not lead:
+        return f"'{task.title}' is due now"
+    return f"'{task.title}' is due in {format_lead(lead)} ({task.deadline:%Y-%m-%d %H:%M})"
+
+
+class DeadlineNotifier:
+    """Reminders for task deadlines in a min-heap ordered by firing time.
+
+    Tasks are TaskRows.  Each pending task with a deadline gets a reminder
+    for every lead time that is still ahead of the clock.  update() and
+    remove() change one task's reminders in O(log n): replaced entries
+    are only marked dead, and the heap is rebuilt once more than half of
+    it is dead.  The thread started by start() sleeps until the earliest
+    reminder is due, so waiting costs nothing however many are scheduled.
+    on_alert runs on that thread and must not block for long.
+    """
+
+    def __init__(self, on_alert, leads=None, clock=datetime.now):
+        self.on_alert = on_alert
+        self.leads = reminder_leads() if leads is None else tuple(sorted(leads, reverse=True))
+        self.clock = clock
+        # Entries are [fire_at, sequence, task, lead]; the sequence number
+        # breaks ties so a dead entry is never compared on its task
+        self._heap = []
+        self._entries = {}  # task id -> its live entries, soonest first
+        self._dead = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def __len__(self):
+        with self._condition:
+            return len(self._heap) - self._dead
+
+    def _reminders(self, task, now):
+        if task.completed or task.deadline is None:
+            return []
+        return [[task.deadline - lead, next(self._sequence), task, lead]
+                for lead in self.leads if task.deadline - lead > now]
+
+    def load(self, tasks):
+        """Replace every reminder with those for tasks"""
+        with self._condition:
+            now = self.clock()
+            self._heap = []
+            self._entries = {}
+            self._dead = 0
+            for task in tasks:
+                entries = self._reminders(task, now)
+                if entries:
+                    self._entries[task.id] = entries
+                    self._heap.extend(entries)
+            heapq.heapify(self._heap)
+            self._condition.notify()
+
+    def update(self, tasks):
+        """Reschedule the reminders of added or changed tasks"""
+        with self._condition:
+            now = self.clock()
+            for task in tasks:
+                entries = self._entries.get(task.id)
+                if entries and not task.completed and entries[0][2].deadline == task.deadline:
+                    for entry in entries:
+                        entry[2] = task  # same deadline; keep the new title
+                    continue
+                self._discard(task.id)
+                entries = self._reminders(task, now)
+                if entries:
+                    self._entries[task.id] = entries
+                    for entry in entries:
+                        heapq.heappush(self._heap, entry)
+            self._condition.notify()
+
+    def remove(self, task_ids):
+        with self._condition:
+            for task_id in task_ids:
+                self._discard(task_id)
+
+    def _discard(self, task_id):
+        entries = self._entries.pop(task_id, None)
+        if not entries:
+            return
+        for entry in entries:
+            entry[2] = None
+        self._dead += len(entries)
+        if self._dead > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if e[2] is not None]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+    def _next_entry(self):
+        """The earliest live entry, dropping dead ones from the top"""
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+            self._dead -= 1
+        return self._heap[0] if self._heap else None
+
+    def due(self, now=None):
+        """Remove and return the (task, lead) reminders due by now"""
+        with self._condition:
+            now = now or self.clock()
+            alerts = []
+            entry = self._next_entry()
+            while entry is not None and entry[0] <= now:
+                heapq.heappop(self._heap)
+                task = entry[2]
+                entries = self._entries[task.id]
+                entries.pop(0)  # a task's reminders come due in order
+                if not entries:
+                    del self._entries[task.id]
+                alerts.append((task, entry[3]))
+                entry = self._next_entry()
+            return alerts
+
+    def next_due(self):
+        """When the earliest reminder fires, or None if there are none"""
+        with self._condition:
+            entry = self._next_entry()
+            return entry[0] if entry else None
+
+    def start(self):
+        """Start the reminder thread (idempotent)"""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="deadline-notifier",
+                                            daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._stopped = True
+            self._condition.notify()
+        if thread is not None:
+            thread.join(timeout=NOTIFIER_MAX_WAIT)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                alerts = self.due()
+                if not alerts:
+                    fire_at = self.next_due()
+                    wait = NOTIFIER_MAX_WAIT
+                    if fire_at is not None:
+                        wait = min(wait, max((fire_at - self.clock()).total_seconds(), 0))
+                    self._condition.wait(wait)
+                    continue
+            for task, lead in alerts:
+                self.on_alert(task, lead)
+
+
+def print_alert(task, lead, desktop=False):
+    message = alert_message(task, lead)
+    print(f"{datetime.now():%Y-%m-%d %H:%M} {message}", flush=True)
+    if desktop:
+        subprocess.run(["notify-send", "Task deadline", message], check=False)
+
+
+def run_notifier(desktop=False):
+    """Print reminders until interrupted, following task changes"""
+    init_database()
+    notifier = DeadlineNotifier(lambda task, lead: print_alert(task, lead, desktop))
+    notifier.load(get_upcoming_deadlines())
+    notifier.start()
+    listening = start_task_listener() is not None
+    print(f"Watching {len(notifier)} reminder(s)", flush=True)
+    reloaded = time.monotonic()
+    try:
+        while True:
+            time.sleep(CHANGE_POLL)
+            if not listening:
+                if time.monotonic() - reloaded >= NOTIFIER_RELOAD:
+                    notifier.load(get_upcoming_deadlines())
+                    reloaded = time.monotonic()
+                continue
+            for batch in get_task_changes():
+                if batch is None:
+                    notifier.load(get_upcoming_deadlines())  # too much changed to patch
+                    continue
+                rows, removed_ids = batch
+                notifier.remove(removed_ids)
+                notifier.update(rows)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        notifier.stop()
+        close_database()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print task deadline reminders.")
+    parser.add_argument("--desktop", action="store_true",
+                        help="also show reminders as desktop notifications (notify-send)")
+    args = parser.parse_args(argv)
+    if args.desktop and shutil.which("notify-send") is None:
+        parser.error("--desktop needs notify-send")
+    run_notifier(args.desktop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Command-line task management for scripts, cron jobs and shell pipelines.
+
+    python -m scheduler add "Essay draft" --deadline "2026-11-01 17:00" --priority High
+    python -m scheduler list --pending --format csv > pending.csv
+    python -m scheduler search report | cut -f1 | xargs python -m scheduler complete
+    python -m scheduler export tasks.jsonl
+
+Only argparse is loaded until a command runs, and then only the engine,
+never tkinter, so a command costs little more than its database query.
+Lists are read a page at a time and written as they arrive, so large ones
+start printing at once and use constant memory.  Commands act as --user
+(default TASK_SCHEDULER_USER) and do not create tables; run "init" once
+on a new database, or start the app.
+"""
+import argparse
+import os
+import sys
+
+# Rows fetched per query while streaming a list
+LIST_PAGE_SIZE = 1000
+
+# Output formats for task lists; text is tab-separated with no header
+OUTPUT_FORMATS = ("text", "csv", "jsonl")
+
+# Fields of a list row, in output order
+ROW_FIELDS = ("id", "title", "priority", "deadline", "completed", "duration",
+              "dependency_level")
+
+
+def task_values(task):
+    # str() is several times faster than strftime and gives the same text
+    deadline = str(task.deadline)[:16] if task.deadline else ""
+    return (task.id, task.title, task.priority, deadline, task.completed,
+            task.duration or "", task.dependency_level)
+
+
+def task_writer(fmt, out):
+    """A function writing one list row to out in the given format"""
+    if fmt == "csv":
+        import csv
+        writer = csv.writer(out)
+        writer.writerow(ROW_FIELDS)
+        return lambda task: writer.writerow(task_values(task))
+    if fmt == "jsonl":
+        import json
+        return lambda task: out.write(json.dumps(dict(zip(ROW_FIELDS, task_values(task))))
+                                      + "\n")
+
+    def write_text(task):
+        values = task_values(task)
+        status = "done" if task.completed else "pending"
+        out.write(f"{values[0]}\t{status}\t{values[2]}\t{values[3] or '-'}\t{values[1]}\n")
+    return write_text
+
+
+def write_tasks(tasks, fmt):
+    write = task_writer(fmt, sys.stdout)
+    count = 0
+    for task in tasks:
+        write(task)
+        count += 1
+    return count
+
+
+def stream_tasks(engine, sort, descending, pending, limit=None):
+    """Yield list rows page by page with engine.get_task_page"""
+    after = None
+    while limit is None or limit > 0:
+        size = LIST_PAGE_SIZE if limit is None else min(LIST_PAGE_SIZE, limit)
+        rows = engine.get_task_page(after=after, limit=size, sort=sort,
+                                    descending=descending, pending=pending)
+        yield from rows
+        if len(rows) < size:
+            return
+        after = rows[-1]
+        if limit is not None:
+            limit -= len(rows)
+
+
+def non_negative_int(value):
+    """argparse type for counts such as --limit"""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {value}")
+    return number
+
+
+def report(message):
+    print(message, file=sys.stderr)
+
+
+# ---------- COMMANDS ----------
+# Each takes the parsed arguments and the engine module and returns the
+# exit status
+
+def cmd_init(args, engine):
+    engine.init_database()
+    return 0
+
+
+def cmd_add(args, engine):
+    row = engine.insert_task_row(args.title, args.description, args.priority,
+                                 args.deadline, args.duration)
+    print(row.id)
+    return 0
+
+
+def cmd_list(args, engine):
+    write_tasks(stream_tasks(engine, args.sort, args.descending, args.pending, args.limit),
+                args.format)
+    return 0
+
+
+def cmd_search(args, engine):
+    limit = engine.SEARCH_LIMIT if args.limit is None else args.limit
+    write_tasks(engine.search_task_rows(args.keyword, limit), args.format)
+    return 0
+
+
+def _report_missing(task_ids, found):
+    found = set(found)
+    missing = [task_id for task_id in task_ids if task_id not in found]
+    for task_id in missing:
+        report(f"Task {task_id} not found")
+    return 1 if missing else 0
+
+
+def cmd_complete(args, engine):
+    rows = engine.set_tasks_completed(args.ids, not args.undo)
+    report(f"{len(rows)} task(s) marked {'pending' if args.undo else 'completed'}")
+    return _report_missing(args.ids, [row.id for row in rows])
+
+
+def cmd_delete(args, engine):
+    deleted = engine.delete_tasks(args.ids)
+    report(f"{len(deleted)} task(s) deleted")
+    return _report_missing(args.ids, deleted)
+
+
+def cmd_import(args, engine):
+    source = sys.stdin if args.file == "-" else args.file
+    fmt = args.format or ("jsonl" if args.file == "-" else None)
+    imported, errors = engine.import_tasks(source, fmt)
+    for line_number, message in errors:
+        report(f"line {line_number}: {message}")
+    report(f"{imported} task(s) imported, {len(errors)} error(s)")
+    return 1 if errors else 0
+
+
+def cmd_export(args, engine):
+    destination = sys.stdout if args.file == "-" else args.file
+    fmt = args.format or ("jsonl" if args.file == "-" else None)
+    count = engine.export_tasks(destination, fmt, archived=args.archived)
+    report(f"{count} task(s) exported")
+    return 0
+
+
+def cmd_archive(args, engine):
+    archived = engine.archive_completed_tasks(args.days)
+    report(f"{len(archived)} task(s) archived")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="scheduler", description="Manage tasks from the command line.")
+    parser.add_argument("--user", help="user whose tasks to manage "
+                                       "(default: TASK_SCHEDULER_USER or the default user)")
+    parser.add_argument("--storage", choices=("postgresql", "sqlite"),
+                        help="storage backend (default: TASK_SCHEDULER_STORAGE)")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    command = commands.add_parser("init", help="create or update the database tables")
+    command.set_defaults(run=cmd_init)
+
+    command = commands.add_parser("add", help="add a task and print its id")
+    command.add_argument("title")
+    command.add_argument("--deadline", required=True, help="YYYY-MM-DD [HH:MM]")
+    command.add_argument("--description", default="")
+    command.add_argument("--priority", choices=("Low", "Medium", "High"), default="Medium")
+    command.add_argument("--duration", type=int, help="estimated minutes of work")
+    command.set_defaults(run=cmd_add)
+
+    # engine.TASK_SORTS, spelled out so --help does not load the engine
+    sorts = ("id", "title", "priority", "deadline", "status", "dependencies")
+    command = commands.add_parser("list", help="list tasks")
+    command.add_argument("--sort", choices=sorts, default="deadline",
+                         help="order (default: %(default)s)")
+    command.add_argument("--descending", action="store_true")
+    command.add_argument("--pending", action="store_true", help="only pending tasks")
+    command.add_argument("--limit", type=non_negative_int, help="list at most this many")
+    command.add_argument("--format", choices=OUTPUT_FORMATS, default="text")
+    command.set_defaults(run=cmd_list)
+
+    command = commands.add_parser("search", help="search titles and descriptions")
+    command.add_argument("keyword")
+    command.add_argument("--limit", type=non_negative_int,
+                         help="list at most this many (default: 200)")
+    command.add_argument("--format", choices=OUTPUT_FORMATS, default="text")
+    command.set_defaults(run=cmd_search)
+
+    command = commands.add_parser("complete", help="mark tasks completed")
+    command.add_argument("ids", type=int, nargs="+", metavar="ID")
+    command.add_argument("--undo", action="store_true", help="mark them pending instead")
+    command.set_defaults(run=cmd_complete)
+
+    command = commands.add_parser("delete", help="delete tasks")
+    command.add_argument("ids", type=int, nargs="+", metavar="ID")
+    command.set_defaults(run=cmd_delete)
+
+    command = commands.add_parser("import", help="load tasks from a CSV or JSON Lines file")
+    command.add_argument("file", help='path, or "-" for standard input (JSON Lines '
+                                      "unless --format csv)")
+    command.add_argument("--format", choices=("csv", "jsonl"),
+                         help="default: from the file extension")
+    command.set_defaults(run=cmd_import)
+
+    command = commands.add_parser("export", help="write tasks to a CSV or JSON Lines file")
+    command.add_argument("file", help='path, or "-" for standard output (JSON Lines '
+                                      "unless --format csv)")
+    command.add_argument("--format", choices=("csv", "jsonl"),
+                         help="default: from the file extension")
+    command.add_argument("--archived", action="store_true",
+                         help="export archived tasks instead")
+    command.set_defaults(run=cmd_export)
+
+    command = commands.add_parser("archive", help="archive old completed tasks")
+    command.add_argument("--days", type=int, default=30,
+                         help="archive tasks completed more than this many days ago "
+                              "(default: %(default)s)")
+    command.set_defaults(run=cmd_archive)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Loaded only now, so --help and usage errors never touch the database
+    from db.storage import DB_ERRORS, configure_storage
+    if args.storage:
+        configure_storage(args.storage)
+    import engine
+
+    try:
+        if args.user:
+            engine.set_current_user(args.user)
+        return args.run(args, engine)
+    except ValueError as e:
+        report(f"Error: {e}")
+        return 1
+    except DB_ERRORS as e:
+        report(f"Database error: {e}")
+        return 1
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop quietly, and
+        # keep the interpreter's final flush from failing again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        engine.close_database()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
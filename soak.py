@@ -0,0 +1,262 @@
+"""Soak test: check that memory stays flat over many task operations.
+
+Repeats a cycle of engine operations (add, edit, complete, re-prioritise,
+view details, search, page and delete) against a working set of tasks,
+taking a diagnostics snapshot every --sample operations.  After the
+first --warmup operations have filled the caches, the run fails (exit
+status 1) if traced memory or live objects grow by more than the
+allowed amount:
+
+    python soak.py --operations 100000
+
+With --ui the main window's list and context menu are driven too, and
+the Tk widget and Tcl command counts must not grow at all; this needs a
+display, and the run fails without one rather than skip the check.  The default SQLite backend runs against a throwaway file; with
+--storage postgresql the tasks belong to a SOAK_USER of their own and
+are deleted afterwards.
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import engine
+from db.storage import configure_storage, get_storage
+from diagnostics import MemoryDiagnostics
+
+# Operations checked by default (#P-003 showed a leak after 500+)
+DEFAULT_OPERATIONS = 100000
+
+# Operations run before the baseline snapshot, so caches are already full
+DEFAULT_WARMUP = 10000
+
+# Operations between diagnostics snapshots
+DEFAULT_SAMPLE = 10000
+
+# Tasks the operations work on
+WORKING_SET = 500
+
+# Most traced memory and live objects allowed to accumulate after warmup
+MAX_GROWTH_KIB = 1024
+MAX_GROWTH_OBJECTS = 2000
+
+# Title prefix of soak tasks
+SOAK_PREFIX = "[soak] "
+
+# User owning the soak tasks, so cleanup never touches anyone else's
+SOAK_USER = "soak"
+
+# Keywords searched by the search operation
+SEARCH_KEYWORDS = ("report", "soak 42", "no-such-task")
+
+# How often the UI run waits for the app's background work to finish
+UI_SETTLE_OPS = 50
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+class Soak:
+    """The cycle of operations, applied to the app's views when app is given"""
+
+    def __init__(self, rng, app=None):
+        self.rng = rng
+        self.app = app
+        self.task_ids = []
+        self.deadline = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d %H:%M")
+        self.steps = (self.add, self.edit, self.complete, self.prioritise,
+                      self.details, self.search, self.page, self.delete)
+        self.count = 0
+
+    def add(self):
+        row = engine.insert_task_row(f"{SOAK_PREFIX}task {self.count}", "soak report",
+                                     "Medium", self.deadline, 30)
+        self.task_ids.append(row.id)
+        self.changed([row])
+
+    def edit(self):
+        task_id = self.rng.choice(self.task_ids)
+        row = engine.update_task_row(task_id, f"{SOAK_PREFIX}edited {self.count}",
+                                     "soak report, edited", "High", self.deadline)
+        self.changed([row] if row else [])
+
+    def complete(self):
+        self.changed(engine.set_tasks_completed(
+            self.rng.sample(self.task_ids, 3), self.rng.random() < 0.5))
+
+    def prioritise(self):
+        self.changed(engine.set_tasks_priority(
+            self.rng.sample(self.task_ids, 3), self.rng.choice(("Low", "Medium", "High"))))
+
+    def details(self):
+        engine.get_task_details(self.rng.choice(self.task_ids))
+
+    def search(self):
+        engine.search_task_rows(self.rng.choice(SEARCH_KEYWORDS))
+
+    def page(self):
+        rows = engine.get_task_page(sort=self.rng.choice(("deadline", "priority", "title")))
+        if self.app is not None:
+            self.app.render_tasks(rows)
+
+    def delete(self):
+        # Keep the working set steady: delete one task per task added
+        task_id = self.task_ids.pop(self.rng.randrange(len(self.task_ids)))
+        self.changed([], engine.delete_tasks([task_id]))
+
+    def changed(self, rows, removed_ids=()):
+        if self.app is None:
+            return
+        self.app.on_tasks_changed(rows, removed_ids)
+        selected = [str(row.id) for row in rows if self.app.tree.exists(str(row.id))]
+        if selected:
+            self.app.tree.selection_set(selected)
+            self.app.update_context_menu(selected)
+
+    def fill(self):
+        while len(self.task_ids) < WORKING_SET:
+            self.add()
+
+    def run(self, operations):
+        for _ in range(operations):
+            self.steps[self.count % len(self.steps)]()
+            self.count += 1
+            if self.app is not None and self.count % UI_SETTLE_OPS == 0:
+                settle(self.app)
+
+
+def settle(app):
+    """Run Tk events until the app's database worker is idle"""
+    app.root.update()
+    while app.worker.pending:
+        app.root.after(app.worker.poll_ms)
+        app.root.update()
+
+
+def create_app():
+    """The main window, withdrawn and already connected, or None without a display"""
+    try:
+        import tkinter as tk
+        import ttkbootstrap as tb
+        from main import TaskSchedulerApp
+        root = tb.Window(themename="flatly")
+    except ImportError as e:
+        log(f"UI soak unavailable: {e}")
+        return None
+    except tk.TclError as e:
+        log(f"UI soak unavailable: {e}")
+        return None
+
+    class SoakApp(TaskSchedulerApp):
+        def connect_database(self):
+            # soak.py has initialised the database already
+            self.db_connected = True
+
+    root.withdraw()
+    return SoakApp(root)
+
+
+def check(diagnostics, snapshot, max_kib, max_objects):
+    """Failure messages for growth since the diagnostics baseline"""
+    growth = diagnostics.growth(snapshot)
+    failures = []
+    if growth.get("traced_kib", 0) > max_kib:
+        failures.append(f"traced memory grew by {growth['traced_kib']:.0f} KiB "
+                        f"(limit {max_kib})")
+    if growth["objects"] > max_objects:
+        failures.append(f"live objects grew by {growth['objects']} (limit {max_objects})")
+    for key in ("widgets", "tcl_commands"):
+        if growth.get(key, 0) > 0:
+            failures.append(f"{key} grew by {growth[key]}")
+    return failures
+
+
+def soak(operations, warmup, sample, ui=False, max_kib=MAX_GROWTH_KIB,
+         max_objects=MAX_GROWTH_OBJECTS):
+    """Run the soak; returns a list of failure messages (empty if memory stayed flat)"""
+    app = create_app() if ui else None
+    if ui and app is None:
+        return ["--ui needs tkinter, ttkbootstrap and a display"]
+    run = Soak(random.Random(0), app)
+    run.fill()
+    run.run(warmup)
+    if app is not None:
+        settle(app)
+
+    diagnostics = MemoryDiagnostics(app.root if app is not None else None)
+    done = 0
+    while done < operations:
+        step = min(sample, operations - done)
+        run.run(step)
+        done += step
+        if app is not None:
+            settle(app)
+        diagnostics.operation(step)
+        snapshot = diagnostics.snapshot()
+        log(f"after {warmup + done} operations:\n{diagnostics.report(snapshot)}")
+    failures = check(diagnostics, snapshot, max_kib, max_objects) if operations else []
+
+    if app is not None:
+        app.worker.shutdown()
+        app.root.destroy()
+    return failures
+
+
+def clear_soak_tasks():
+    """Delete the soak tasks of SOAK_USER, the current user"""
+    owner_id = engine.get_or_create_user(engine.current_user())
+    with get_storage().connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM tasks WHERE owner_id = %s AND title LIKE %s",
+                    (owner_id, SOAK_PREFIX + "%"))
+        conn.commit()
+    engine.invalidate_statistics()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--operations", type=int, default=DEFAULT_OPERATIONS,
+                        help="operations checked after warmup (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP,
+                        help="operations run before the baseline (default: %(default)s)")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE,
+                        help="operations between snapshots (default: %(default)s)")
+    parser.add_argument("--storage", choices=("sqlite", "postgresql"), default="sqlite",
+                        help="storage backend to use (default: %(default)s)")
+    parser.add_argument("--ui", action="store_true",
+                        help="also drive the main window (needs a display)")
+    parser.add_argument("--max-growth-kib", type=float, default=MAX_GROWTH_KIB,
+                        help="traced memory growth allowed (default: %(default)s)")
+    parser.add_argument("--max-growth-objects", type=int, default=MAX_GROWTH_OBJECTS,
+                        help="live object growth allowed (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.storage == "sqlite":
+            configure_storage("sqlite", path=os.path.join(directory, "soak.db"))
+        else:
+            configure_storage("postgresql")
+        with contextlib.redirect_stdout(sys.stderr):
+            engine.init_database()
+        engine.set_current_user(SOAK_USER)
+        try:
+            failures = soak(args.operations, args.warmup, args.sample, args.ui,
+                            args.max_growth_kib, args.max_growth_objects)
+        finally:
+            if args.storage != "sqlite":
+                clear_soak_tasks()
+            engine.close_database()
+
+    for failure in failures:
+        log(f"FAIL: {failure}")
+    if failures:
+        return 1
+    log("PASS: memory stayed flat")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
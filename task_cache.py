@@ -0,0 +1,194 @@
+import json
+import queue
+import select
+import threading
+from collections import OrderedDict
+
+from db.init_db import TASK_CHANGES_CHANNEL
+from db.storage import DB_ERRORS
+
+# Default number of task records kept by a TaskCache
+TASK_CACHE_SIZE = 10000
+
+# Seconds the listener waits for a notification before checking for stop()
+LISTEN_TIMEOUT = 1.0
+# Seconds between reconnection attempts after the listening connection fails
+LISTEN_RETRY = 5.0
+
+
+class TaskCache:
+    """Thread-safe LRU cache of task records keyed by task id.
+
+    Records are objects with an id attribute (engine.TaskRecord).  get() counts
+    hits and misses and marks the record as recently used; peek() does
+    neither.  Once maxsize records are cached, the least recently used one
+    is dropped for each new record.
+    """
+
+    def __init__(self, maxsize=TASK_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.maxsize = maxsize
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    def get(self, task_id):
+        with self._lock:
+            record = self._records.get(task_id)
+            if record is None:
+                self._misses += 1
+                return None
+            self._records.move_to_end(task_id)
+            self._hits += 1
+            return record
+
+    def peek(self, task_id):
+        with self._lock:
+            return self._records.get(task_id)
+
+    def put(self, record):
+        with self._lock:
+            self._records[record.id] = record
+            self._records.move_to_end(record.id)
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def discard(self, task_ids):
+        with self._lock:
+            for task_id in task_ids:
+                self._records.pop(task_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._records),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+
+class TaskChangeListener:
+    """Keep a TaskCache in step with task changes made by other connections.
+
+    A background thread LISTENs on TASK_CHANGES_CHANNEL, where triggers
+    announce the ids of changed tasks after each committed statement.
+    Changes from this process's own pooled connections are skipped, since
+    engine.py already writes those through to the cache.  For the rest,
+    fetch(ids) reloads the current records in one query: records found
+    replace the cached ones and ids not found were deleted.  Each batch is
+    also queued as (records, removed_ids) for changes(); None is queued
+    instead when the cache had to be cleared, because a statement changed
+    too many tasks to list or notifications may have been missed while
+    reconnecting.  on_change() is called after every batch.
+
+    connect() must return a new autocommit psycopg2 connection and
+    own_pids() the server process ids of this process's other connections.
+    Notifications name the owner of the changed tasks; when given, owner()
+    returns the user id whose changes are followed and other users'
+    changes are ignored.
+    """
+
+    def __init__(self, cache, fetch, connect, own_pids, on_change=None, owner=None,
+                 channel=TASK_CHANGES_CHANNEL):
+        self.cache = cache
+        self.fetch = fetch
+        self.on_change = on_change
+        self.owner = owner
+        self.channel = channel
+        self._connect = connect
+        self._own_pids = own_pids
+        self._changes = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="task-listener",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def changes(self):
+        """Return the batches queued since the last call, oldest first"""
+        batches = []
+        while True:
+            try:
+                batches.append(self._changes.get_nowait())
+            except queue.Empty:
+                return batches
+
+    def _run(self):
+        reconnecting = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                if reconnecting:
+                    self._reset()
+                reconnecting = True
+                self._listen(conn)
+            except DB_ERRORS as e:
+                print(f"Task change listener error: {e}")
+                self._stop.wait(LISTEN_RETRY)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if not select.select([conn], [], [], LISTEN_TIMEOUT)[0]:
+                continue
+            conn.poll()
+            own = self._own_pids()
+            owner = self.owner() if self.owner else None
+            task_ids = set()
+            reset = False
+            for notify in conn.notifies:
+                if notify.pid in own:
+                    continue
+                payload = json.loads(notify.payload)
+                if owner is not None and payload.get("owner", owner) != owner:
+                    continue
+                if payload.get("reset"):
+                    reset = True
+                else:
+                    task_ids.update(payload["ids"])
+            conn.notifies.clear()
+            if reset:
+                self._reset()
+            elif task_ids:
+                self._apply(task_ids)
+
+    def _apply(self, task_ids):
+        records = self.fetch(list(task_ids))
+        for record in records:
+            self.cache.put(record)
+        removed = task_ids.difference(record.id for record in records)
+        self.cache.discard(removed)
+        self._changes.put((records, sorted(removed)))
+        if self.on_change:
+            self.on_change()
+
+    def _reset(self):
+        self.cache.clear()
+        self._changes.put(None)
+        if self.on_change:
+            self.on_change()
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-from engine import get_all_tasks, search_tasks, get_task_details
+from engine import get_task_details, get_task_rows, search_task_rows
 
 
 def create_task_table(root):
@@ -16,7 +16,7 @@ def create_task_table(root):
     def handle_search():
         query = search_var.get()
         if query.strip():
-            update_tree(tree, search_tasks(query))
+            update_tree(tree, search_task_rows(query))
         else:
             refresh_tasks(tree)
 
@@ -26,13 +26,13 @@ def create_task_table(root):
     tk.Button(search_frame, text="Go", command=handle_search).pack(side="left")
 
     tree = ttk.Treeview(wrapper, columns=(
-        "ID", "Title", "Priority", "Deadline", "Days Left"), show="headings")
-    tree.heading("ID", text="ID")
+        "#", "Title", "Priority", "Deadline", "Days Left"), show="headings")
+    tree.heading("#", text="#")
     tree.heading("Title", text="Title")
     tree.heading("Priority", text="Priority")
     tree.heading("Deadline", text="Deadline")
     tree.heading("Days Left", text="Days Left")
-    tree.column("ID", width=30)
+    tree.column("#", width=30)
     tree.column("Title", width=150)
     tree.column("Priority", width=80)
     tree.column("Deadline", width=100)
@@ -42,12 +42,12 @@ def create_task_table(root):
     def show_description(event):
         selected_item = tree.focus()
         if selected_item:
-            task_id = tree.item(selected_item)["values"][0]
+            task_id = int(selected_item)  # Rows are keyed by task id
             task_details = get_task_details(task_id)
             if task_details:
-                description = task_details[2]  # Description is at index 2
+                description = task_details.description
                 messagebox.showinfo("Task Description",
-                                    f"Title: {task_details[1]}\n\nDescription:\n{description if description else 'No description available'}")
+                                    f"Title: {task_details.title}\n\nDescription:\n{description if description else 'No description available'}")
 
     tree.bind("<Double-1>", show_description)
     refresh_tasks(tree)
@@ -55,27 +55,25 @@ def create_task_table(root):
 
 
 def refresh_tasks(tree):
-    tasks = get_all_tasks()
-    for item in tree.get_children():
-        tree.delete(item)
-    for task in tasks:
-        task_id, title, _, priority, deadline, duration = task
-        tree.insert("", "end", values=(task_id, title, priority, deadline, duration),
-                    tags=("overdue",) if is_overdue(deadline) else ())
+    update_tree(tree, get_task_rows())
 
 
 def update_tree(tree, rows):
+    """Show engine.TaskRow rows, numbered 1..n in the order given"""
     for item in tree.get_children():
         tree.delete(item)
-    for row in rows:
-        task_id, title, _, priority, deadline, duration = row
-        tree.insert("", "end", values=(task_id, title, priority, deadline, duration),
-                    tags=("overdue",) if is_overdue(deadline) else ())
-
-
-def is_overdue(deadline_str):
-    try:
-        deadline = datetime.strptime(deadline_str, "%Y-%m-%d")
-        return deadline.date() < datetime.now().date()
-    except:
-        return False
+    for position, task in enumerate(rows, start=1):
+        tree.insert("", "end", iid=str(task.id),
+                    values=(position, task.title, task.priority, task.deadline,
+                            days_left(task.deadline)),
+                    tags=("overdue",) if is_overdue(task.deadline) else ())
+
+
+def days_left(deadline):
+    if deadline is None:
+        return ""
+    return (deadline.date() - datetime.now().date()).days
+
+
+def is_overdue(deadline):
+    return deadline is not None and deadline.date() < datetime.now().date()
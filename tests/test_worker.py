@@ -0,0 +1,107 @@
+"""DBWorker runs mutations in order, so the view ends up matching the database.
+
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+from db.storage import configure_storage  # noqa: E402
+from worker import DBWorker  # noqa: E402
+
+
+class FakeRoot:
+    """Just Tk's after(), run by pump() instead of a main loop"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+    def pump(self, worker, timeout=30):
+        deadline = time.monotonic() + timeout
+        while worker.pending or self.callbacks:
+            if time.monotonic() > deadline:
+                raise AssertionError("worker did not finish")
+            callbacks, self.callbacks = self.callbacks, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.001)
+
+
+def jittered(func, rng):
+    """func, with random few-millisecond delays before it and after it commits.
+
+    On a thread pool these reorder both the commits and the callbacks.
+    """
+    before, after = rng.random() * 0.005, rng.random() * 0.005
+
+    def call(*args):
+        time.sleep(before)
+        result = func(*args)
+        time.sleep(after)
+        return result
+    return call
+
+
+class SerialMutationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        configure_storage("sqlite", path=os.path.join(self.directory.name, "tasks.db"))
+        engine.init_database()
+        self.root = FakeRoot()
+        self.worker = DBWorker(self.root, max_pending=1000)
+
+    def tearDown(self):
+        self.worker.shutdown(wait=True)
+        engine.close_database()
+        self.directory.cleanup()
+
+    def test_conflicting_mutations_leave_view_matching_database(self):
+        rng = random.Random(7)
+        rows = [engine.insert_task_row(f"task {n}", "", "Medium", "2026-11-01 12:00")
+                for n in range(5)]
+        view = {row.id: row for row in rows}
+        task_ids = list(view)
+
+        def changed(tasks):
+            for task in tasks:
+                view[task.id] = task
+
+        def removed(deleted):
+            for task_id in deleted:
+                view.pop(task_id, None)
+
+        for n in range(200):
+            task_id = rng.choice(task_ids)
+            choice = rng.random()
+            if choice < 0.4:
+                func, args, on_success = (engine.set_tasks_completed,
+                                          ([task_id], n % 2 == 0), changed)
+            elif choice < 0.7:
+                func, args, on_success = (engine.set_tasks_priority,
+                                          ([task_id], rng.choice(("Low", "Medium", "High"))),
+                                          changed)
+            elif choice < 0.9:
+                func, args, on_success = (engine.update_task_row,
+                                          (task_id, f"edit {n}", "", "Medium",
+                                           "2026-11-02 12:00"),
+                                          lambda task: changed([task] if task else []))
+            else:
+                func, args, on_success = engine.delete_tasks, ([task_id],), removed
+            self.assertTrue(self.worker.submit(jittered(func, rng), *args,
+                                               on_success=on_success, serial=True))
+        self.root.pump(self.worker)
+
+        self.assertEqual(view, {row.id: row for row in engine.get_task_rows()})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Default sizing for the background database worker
+WORKER_THREADS = 4
+WORKER_MAX_PENDING = 32
+# How often finished jobs are delivered to the Tk thread (~60 fps)
+WORKER_POLL_MS = 16
+
+
+class DBWorker:
+    """Run blocking database calls on background threads for a Tk app.
+
+    submit() hands a function to a small thread pool and returns
+    immediately.  When the call finishes, its on_success or on_error
+    callback is run on the Tk thread via root.after, so callbacks may touch
+    widgets freely.  Reads run concurrently on the pool; calls submitted
+    with serial=True (every mutation) run one at a time on a thread of
+    their own, so they commit and their callbacks run in submission order.  At most max_pending jobs may be queued or running;
+    further submissions are refused so a stalled database cannot build up
+    an unbounded backlog.  on_busy_change(busy) is called on the Tk thread
+    whenever the worker goes from idle to busy or back.
+    """
+
+    def __init__(self, root, threads=WORKER_THREADS, max_pending=WORKER_MAX_PENDING,
+                 poll_ms=WORKER_POLL_MS, on_busy_change=None):
+        self.root = root
+        self.max_pending = max_pending
+        self.poll_ms = poll_ms
+        self.on_busy_change = on_busy_change
+        self._executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="db-worker")
+        self._serial = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._done = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._polling = False
+        self._busy = False
+
+    @property
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def submit(self, func, *args, on_success=None, on_error=None, serial=False, **kwargs):
+        """Queue func(*args, **kwargs); returns False if the queue is full"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+
+        def job():
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._done.put((on_error, e))
+            else:
+                self._done.put((on_success, result))
+
+        (self._serial if serial else self._executor).submit(job)
+        self._set_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._deliver)
+        return True
+
+    def _deliver(self):
+        """Run callbacks for finished jobs; runs on the Tk thread"""
+        try:
+            while True:
+                try:
+                    callback, value = self._done.get_nowait()
+                except queue.Empty:
+                    break
+                with self._lock:
+                    self._pending -= 1
+                if callback:
+                    callback(value)
+        finally:
+            # Keep polling even if a callback raised
+            if self.pending:
+                self.root.after(self.poll_ms, self._deliver)
+            else:
+                self._polling = False
+                self._set_busy(False)
+
+    def _set_busy(self, busy):
+        if busy != self._busy:
+            self._busy = busy
+            if self.on_busy_change:
+                self.on_busy_change(busy)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._serial.shutdown(wait=wait, cancel_futures=True)